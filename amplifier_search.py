@@ -0,0 +1,236 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, permutations
+from math import perm
+from typing import Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+from intcode_computer import IntcodeComputer
+
+PhaseSetting = Tuple[int, ...]
+
+
+class SearchResult(NamedTuple):
+    phase_setting: Optional[PhaseSetting]
+    output: Optional[int]
+
+
+def run_chain(prototype: IntcodeComputer, phase_setting: PhaseSetting, signal: int = 0,
+              feedback: bool = False) -> int:
+    """
+    Send signal through a chain of amplifiers, one per phase, all forked from a freshly reset prototype.
+    With feedback the output of the last amplifier is fed back into the first until it finishes.
+    """
+    amplifiers = [prototype.fork() for _ in phase_setting]
+    first_pass = True
+    while True:
+        for phase, amplifier in zip(phase_setting, amplifiers):
+            amplifier.run(*((phase, signal) if first_pass else (signal,)))
+            if not amplifier.output_values:
+                raise ValueError(f'Amplifier with phase {phase} did not produce a signal')
+            signal = amplifier.output_values[-1]
+            amplifier.output_values = []
+        first_pass = False
+        if not feedback or amplifiers[-1].finished:
+            return signal
+
+
+def _best_of(results: Iterable[SearchResult]) -> SearchResult:
+    best = SearchResult(None, None)
+    for result in results:
+        if result.phase_setting is not None and (best.output is None or result.output > best.output):
+            best = result
+    return best
+
+
+def _search_chunk(program: Sequence[int], phase_settings: Iterable[PhaseSetting], signal: int, feedback: bool,
+                  engine: Type[IntcodeComputer]) -> SearchResult:
+    prototype = engine(program)
+    return _best_of(SearchResult(phase_setting, run_chain(prototype, phase_setting, signal, feedback))
+                    for phase_setting in phase_settings)
+
+
+class AmplifierSearch:
+    """
+    Find the phase setting that gives the highest output signal of a chain of amplifiers (day 7).
+
+    Every permutation of `length` phases out of `phases` is tried. With workers=1 the search runs in
+    this process, otherwise the permutations are split into chunks for a process pool. Either way the
+    result is the same: on equal output the setting that comes first in permutation order wins.
+    """
+
+    def __init__(self, program: Sequence[int], phases: Iterable[int] = range(5), length: Optional[int] = None,
+                 feedback: bool = False, signal: int = 0, engine: Type[IntcodeComputer] = IntcodeComputer,
+                 workers: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.program = list(program)
+        self.phases = tuple(phases)
+        self.length = len(self.phases) if length is None else length
+        self.feedback = feedback
+        self.signal = signal
+        self.engine = engine
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+
+    def phase_settings(self) -> Iterator[PhaseSetting]:
+        return permutations(self.phases, self.length)
+
+    def evaluate(self, phase_setting: PhaseSetting) -> int:
+        return run_chain(self.engine(self.program), tuple(phase_setting), self.signal, self.feedback)
+
+    def _chunks(self, chunk_size: int) -> Iterator[List[PhaseSetting]]:
+        phase_settings = self.phase_settings()
+        while True:
+            chunk = list(islice(phase_settings, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def run(self) -> SearchResult:
+        if self.workers <= 1:
+            return _search_chunk(self.program, self.phase_settings(), self.signal, self.feedback, self.engine)
+
+        chunk_size = self.chunk_size
+        if chunk_size is None:
+            # A few chunks per worker keeps the pool busy when chunks take unequal time
+            chunk_size = max(1, perm(len(self.phases), self.length) // (self.workers * 4))
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(_search_chunk, self.program, chunk, self.signal, self.feedback, self.engine)
+                       for chunk in self._chunks(chunk_size)]
+            # Reduce in submission order so ties resolve exactly as in the single-process search
+            return _best_of(future.result() for future in futures)
+
+
+class LRUCache:
+    """A mapping that keeps at most maxsize entries, dropping the least recently used, and counts hits and misses."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MemoizedAmplifierSearch(AmplifierSearch):
+    """
+    The search of AmplifierSearch, walking the tree of phase settings depth-first so that settings
+    with a common prefix share the amplifiers of that prefix.
+
+    All amplifiers run the same program, so the output of an amplifier depends on its phase and its
+    input signal only. Those outputs are kept in an LRU cache of cache_size entries, with feedback
+    together with the amplifier paused after its first pass, which the feedback loop forks. Every
+    amplifier is forked from one computer per phase that has already read its phase and waits for
+    the signal. executions counts the amplifier runs, which for a chain of n out of n phases drops
+    from n * n! to at most the number of distinct (phase, signal) pairs.
+
+    It always runs in this process, and finds the same result as AmplifierSearch.
+    """
+
+    def __init__(self, program: Sequence[int], phases: Iterable[int] = range(5), length: Optional[int] = None,
+                 feedback: bool = False, signal: int = 0, engine: Type[IntcodeComputer] = IntcodeComputer,
+                 cache_size: int = 4096):
+        super().__init__(program, phases, length, feedback, signal, engine, workers=1)
+        self.cache_size = cache_size
+        self.cache = LRUCache(cache_size)
+        self.executions = 0
+        # phase -> computer that has read the phase and waits for the signal
+        self._primed: Dict[int, IntcodeComputer] = {}
+
+    def _primed_amplifier(self, phase: int) -> IntcodeComputer:
+        amplifier = self._primed.get(phase)
+        if amplifier is None:
+            amplifier = self._primed[phase] = self.engine(self.program)
+            amplifier.run(phase)
+            self.executions += 1
+        return amplifier.fork()
+
+    def _run(self, amplifier: IntcodeComputer, phase: int, signal: int) -> int:
+        amplifier.run(signal)
+        self.executions += 1
+        if not amplifier.output_values:
+            raise ValueError(f'Amplifier with phase {phase} did not produce a signal')
+        output = amplifier.output_values[-1]
+        amplifier.output_values = []
+        return output
+
+    def _amplify(self, phase: int, signal: int) -> Tuple[int, Optional[IntcodeComputer]]:
+        """The output of the first pass of an amplifier, and with feedback the amplifier after it."""
+        key = (phase, signal)
+        entry = self.cache.get(key)
+        if entry is None:
+            amplifier = self._primed_amplifier(phase)
+            entry = (self._run(amplifier, phase, signal), amplifier if self.feedback else None)
+            self.cache.put(key, entry)
+        return entry
+
+    def _feedback_loop(self, phase_setting: PhaseSetting, amplifiers: List[IntcodeComputer], signal: int) -> int:
+        # The cached amplifiers may be used by other settings, continue with forks
+        amplifiers = [amplifier.fork() for amplifier in amplifiers]
+        while not amplifiers[-1].finished:
+            for phase, amplifier in zip(phase_setting, amplifiers):
+                signal = self._run(amplifier, phase, signal)
+        return signal
+
+    def run(self) -> SearchResult:
+        best = SearchResult(None, None)
+        n = len(self.phases)
+        # One frame per depth of the tree: the next phase index to try and the signal into this depth.
+        # prefix holds the indices of the phases chosen above, amplifiers (with feedback) their amplifiers.
+        prefix: List[int] = []
+        amplifiers: List[IntcodeComputer] = []
+        used = [False] * n
+        stack = [(0, self.signal)]
+        while stack:
+            start, signal = stack.pop()
+            if len(prefix) == self.length:
+                phase_setting = tuple(self.phases[i] for i in prefix)
+                output = self._feedback_loop(phase_setting, amplifiers, signal) if self.feedback and amplifiers else signal
+                if best.output is None or output > best.output:
+                    best = SearchResult(phase_setting, output)
+                start = n
+            for i in range(start, n):
+                if not used[i]:
+                    output, amplifier = self._amplify(self.phases[i], signal)
+                    # Come back to this depth at the next index once the subtree is done
+                    stack.append((i + 1, signal))
+                    used[i] = True
+                    prefix.append(i)
+                    amplifiers.append(amplifier)
+                    stack.append((0, output))
+                    break
+            else:
+                # All phases at this depth are done, go back up
+                if prefix:
+                    used[prefix.pop()] = False
+                    amplifiers.pop()
+        return best
+
+    def stats(self) -> str:
+        runs = f'{self.executions} amplifier runs'
+        if not self.feedback:
+            runs += f' ({self.length * perm(len(self.phases), self.length)} without sharing)'
+        return (f'{runs}, cache: {self.cache.hits} hits, {self.cache.misses} misses, '
+                f'hit rate {self.cache.hit_rate:.1%}')
@@ -1,4 +1,6 @@
-from typing import Dict
+from typing import Dict, Optional
+
+from orbit_map import OrbitIndex, iter_orbits
 
 
 class SpaceVertex:
@@ -44,14 +46,25 @@ class SpaceVertex:
 class UniverseOrbitMap:
     def __init__(self):
         self.vertices: Dict[str, SpaceVertex] = {}
+        # Depth and LCA tables, built on first use and then updated with every new edge
+        self._index: Optional[OrbitIndex] = None
+        self._ids: Dict[str, int] = {}
 
     def _add_vertex(self, name):
         if name not in self.vertices:
             self.vertices[name] = SpaceVertex(name)
+            if self._index is not None:
+                self._ids[name] = len(self._ids)
+                self._index.add_bodies()
         else:
             raise ValueError(f'Vertex {name} is already in the vertices map.')
 
     def add_edge(self, name_origin, name_dest):
+        dest_vertex = self.vertices.get(name_dest)
+        if dest_vertex is not None and dest_vertex.parent is not None:
+            if dest_vertex.parent.name == name_origin:
+                return
+            raise ValueError(f'{name_dest} already orbits {dest_vertex.parent.name}, not {name_origin}')
         if name_origin not in self.vertices:
             self._add_vertex(name_origin)
         if name_dest not in self.vertices:
@@ -60,37 +73,57 @@ class UniverseOrbitMap:
         origin_vertex = self.vertices[name_origin]
         dest_vertex = self.vertices[name_dest]
 
+        if self._index is not None:
+            origin, dest = self._ids[name_origin], self._ids[name_dest]
+            if self._index.lca(origin, dest) == dest:
+                raise ValueError(f'{name_dest} cannot orbit {name_origin}, which orbits it')
+            subtree = [dest_vertex]
+            for vertex in subtree:
+                subtree.extend(vertex.child_nodes)
+            self._index.reparent(dest, origin, [self._ids[vertex.name] for vertex in subtree])
+
         dest_vertex.parent = origin_vertex
         origin_vertex.add_child(dest_vertex)
 
     @classmethod
     def from_file(cls, filepath):
         instance = cls()
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-            for line in lines:
-                origin, dest = line.replace('\n', '').split(')')
+        for line_number, origin, dest in iter_orbits(filepath):
+            try:
                 instance.add_edge(origin, dest)
+            except ValueError as error:
+                raise ValueError(f'Line {line_number}: {error}') from None
         return instance
 
     @property
     def graph(self):
         return self.vertices['COM']
 
+    @property
+    def index(self) -> OrbitIndex:
+        if self._index is None:
+            self._ids = {name: i for i, name in enumerate(self.vertices)}
+            self._index = OrbitIndex([-1 if vertex.parent is None else self._ids[vertex.parent.name]
+                                      for vertex in self.vertices.values()])
+        return self._index
+
+    def total_orbits(self) -> int:
+        return self.index.total_orbits()
+
+    def depth(self, name: str) -> int:
+        index = self.index
+        return int(index.depths[self._ids[name]])
+
+    def distance(self, name_a: str, name_b: str) -> int:
+        """Same as SpaceVertex.distance_to, in O(log n) per query."""
+        index = self.index
+        return index.distance(self._ids[name_a], self._ids[name_b])
+
 
 if __name__ == '__main__':
     universe_map = UniverseOrbitMap.from_file('./day6input')
     print(universe_map.graph)
     print(universe_map.vertices)
 
-    total_distance = 0
-
-    for vertex in universe_map.vertices.values():
-        total_distance += len(vertex.get_all_parents())
-
-    print(total_distance)
-
-    you = universe_map.vertices.get('YOU')
-    san = universe_map.vertices.get('SAN')
-    print(you.distance_to(san))
-    print(san.distance_to(you))
+    print(universe_map.total_orbits())
+    print(universe_map.distance('YOU', 'SAN'))
@@ -0,0 +1,219 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from intcode_computer import PARAMETER_COUNTS, IntcodeComputer
+
+INT64_MIN = np.iinfo(np.int64).min
+
+
+def _checked_add(a, b):
+    result = a + b
+    return result, ((a ^ result) & (b ^ result)) < 0
+
+
+def _checked_multiply(a, b):
+    result = a * b
+    overflow = (a != 0) & (result // np.where(a == 0, 1, a) != b)
+    return result, overflow | (a == -1) & (b == INT64_MIN)
+
+
+def _compare_less(a, b):
+    return (a < b).astype(np.int64), np.zeros(a.shape, dtype=bool)
+
+
+def _compare_equal(a, b):
+    return (a == b).astype(np.int64), np.zeros(a.shape, dtype=bool)
+
+
+class BatchIntcodeComputer:
+    """
+    Runs one program for many independent inputs at once. Every lane is a VM whose memory is a row
+    of an int64 matrix; each step the active lanes are grouped by their current opcode and every
+    group is executed with array operations. Lanes that halt or wait for input are masked off.
+
+    Lanes the vectorized path cannot follow exactly (an int64 overflow, an address outside
+    memory_size, more than max_outputs outputs, an invalid instruction) are re-run on the scalar
+    IntcodeComputer, so results always match the scalar interpreter lane for lane.
+    """
+    EXTRA_MEMORY = 256
+
+    def __init__(self, initial_memory: Sequence[int], memory_size: Optional[int] = None, max_outputs: int = 64):
+        self.initial_memory = list(initial_memory)
+        self.memory_size = memory_size or len(self.initial_memory) + self.EXTRA_MEMORY
+        self.max_outputs = max_outputs
+        self.steps = 0
+
+    def run(self, inputs: Sequence[Sequence[int]]) -> List[List[int]]:
+        """Run one lane per input sequence and return the outputs of every lane."""
+        inputs = [list(lane_inputs) for lane_inputs in inputs]
+        lanes = len(inputs)
+        self.memory = np.zeros((lanes, self.memory_size), dtype=np.int64)
+        self.index = np.zeros(lanes, dtype=np.int64)
+        self.relative_base = np.zeros(lanes, dtype=np.int64)
+        self.inputs = np.zeros((lanes, max([len(lane_inputs) for lane_inputs in inputs] + [1])), dtype=np.int64)
+        self.input_count = np.array([len(lane_inputs) for lane_inputs in inputs], dtype=np.int64)
+        self.input_position = np.zeros(lanes, dtype=np.int64)
+        self.outputs = np.zeros((lanes, self.max_outputs), dtype=np.int64)
+        self.output_count = np.zeros(lanes, dtype=np.int64)
+        self.finished = np.zeros(lanes, dtype=bool)
+        self.halted = np.zeros(lanes, dtype=bool)
+        self.fallback = np.zeros(lanes, dtype=bool)
+        self.steps = 0
+
+        try:
+            self.memory[:, :len(self.initial_memory)] = self.initial_memory
+        except (OverflowError, ValueError):
+            # Words that do not fit in an int64 (or a program larger than memory_size)
+            self.fallback[:] = True
+        if len(set(self.input_count.tolist())) == 1 and self.input_count[0]:
+            try:
+                self.inputs[:] = inputs
+            except OverflowError:
+                self._fill_inputs(inputs)
+        else:
+            self._fill_inputs(inputs)
+
+        with np.errstate(over='ignore'):
+            while True:
+                active = np.flatnonzero(~(self.finished | self.halted | self.fallback))
+                if not active.size:
+                    break
+                self._step(active)
+                self.steps += 1
+
+        results = [row[:count] for row, count in zip(self.outputs.tolist(), self.output_count.tolist())]
+        for lane in np.flatnonzero(self.fallback):
+            computer = IntcodeComputer(self.initial_memory)
+            computer.run(*inputs[lane])
+            results[lane] = list(computer.output_values)
+            self.finished[lane] = computer.finished
+            self.halted[lane] = computer.halted
+        return results
+
+    def _fill_inputs(self, inputs: List[List[int]]):
+        for lane, lane_inputs in enumerate(inputs):
+            try:
+                self.inputs[lane, :len(lane_inputs)] = lane_inputs
+            except OverflowError:
+                self.fallback[lane] = True
+
+    def _step(self, lanes: np.ndarray):
+        ip = self.index[lanes]
+        ip_valid = (ip >= 0) & (ip < self.memory_size)
+        words = self.memory[lanes, np.where(ip_valid, ip, 0)]
+        opcodes = np.where(ip_valid & (words >= 0), words % 100, 100)
+
+        for opcode in np.flatnonzero(np.bincount(opcodes, minlength=101)).tolist():
+            group = opcodes == opcode
+            handler = self.HANDLERS.get(opcode)
+            if handler is None:
+                self.fallback[lanes[group]] = True
+                continue
+            # Only the lanes whose parameters run past the end of memory leave the vectorized path
+            past_end = group & (ip + PARAMETER_COUNTS[opcode] >= self.memory_size)
+            if past_end.any():
+                self.fallback[lanes[past_end]] = True
+                group &= ~past_end
+                if not group.any():
+                    continue
+            handler(self, lanes[group], ip[group], words[group])
+
+    def _resolve(self, lanes, ip, words, k, write=False):
+        """Address of parameter k, and a mask of the lanes for which it is not valid."""
+        raw = self.memory[lanes, ip + k]
+        mode = words // 10 ** (k + 1) % 10
+        relative = self.relative_base[lanes] + raw
+        if write:
+            address = np.where(mode == 2, relative, raw)
+            invalid = (mode != 0) & (mode != 2)
+        else:
+            address = np.where(mode == 0, raw, np.where(mode == 2, relative, ip + k))
+            invalid = mode > 2
+        invalid |= (address < 0) | (address >= self.memory_size)
+        return np.where(invalid, 0, address), invalid
+
+    def _keep(self, lanes, invalid):
+        """Hand the invalid lanes to the scalar interpreter and return the mask of the others."""
+        self.fallback[lanes[invalid]] = True
+        return ~invalid
+
+    def _binary(self, lanes, ip, words, operation):
+        a, invalid_a = self._resolve(lanes, ip, words, 1)
+        b, invalid_b = self._resolve(lanes, ip, words, 2)
+        destination, invalid_destination = self._resolve(lanes, ip, words, 3, write=True)
+        result, overflow = operation(self.memory[lanes, a], self.memory[lanes, b])
+        ok = self._keep(lanes, invalid_a | invalid_b | invalid_destination | overflow)
+        self.memory[lanes[ok], destination[ok]] = result[ok]
+        self.index[lanes[ok]] = ip[ok] + 4
+
+    def _sum(self, lanes, ip, words):
+        self._binary(lanes, ip, words, _checked_add)
+
+    def _product(self, lanes, ip, words):
+        self._binary(lanes, ip, words, _checked_multiply)
+
+    def _less_than(self, lanes, ip, words):
+        self._binary(lanes, ip, words, _compare_less)
+
+    def _equals(self, lanes, ip, words):
+        self._binary(lanes, ip, words, _compare_equal)
+
+    def _input(self, lanes, ip, words):
+        available = self.input_position[lanes] < self.input_count[lanes]
+        # Lanes without input wait at this instruction, like the scalar computer
+        self.halted[lanes[~available]] = True
+        lanes, ip, words = lanes[available], ip[available], words[available]
+
+        destination, invalid = self._resolve(lanes, ip, words, 1, write=True)
+        ok = self._keep(lanes, invalid)
+        lanes, ip, destination = lanes[ok], ip[ok], destination[ok]
+        self.memory[lanes, destination] = self.inputs[lanes, self.input_position[lanes]]
+        self.input_position[lanes] += 1
+        self.index[lanes] = ip + 2
+
+    def _output(self, lanes, ip, words):
+        value, invalid = self._resolve(lanes, ip, words, 1)
+        ok = self._keep(lanes, invalid | (self.output_count[lanes] >= self.max_outputs))
+        lanes, ip, value = lanes[ok], ip[ok], value[ok]
+        self.outputs[lanes, self.output_count[lanes]] = self.memory[lanes, value]
+        self.output_count[lanes] += 1
+        self.index[lanes] = ip + 2
+
+    def _jump(self, lanes, ip, words, if_true):
+        condition, invalid_condition = self._resolve(lanes, ip, words, 1)
+        target, invalid_target = self._resolve(lanes, ip, words, 2)
+        ok = self._keep(lanes, invalid_condition | invalid_target)
+        lanes, ip, condition, target = lanes[ok], ip[ok], condition[ok], target[ok]
+        taken = (self.memory[lanes, condition] != 0) == if_true
+        self.index[lanes] = np.where(taken, self.memory[lanes, target], ip + 3)
+
+    def _jump_if_true(self, lanes, ip, words):
+        self._jump(lanes, ip, words, True)
+
+    def _jump_if_false(self, lanes, ip, words):
+        self._jump(lanes, ip, words, False)
+
+    def _adjust_relative_base(self, lanes, ip, words):
+        offset, invalid = self._resolve(lanes, ip, words, 1)
+        ok = self._keep(lanes, invalid)
+        lanes, ip, offset = lanes[ok], ip[ok], offset[ok]
+        self.relative_base[lanes] += self.memory[lanes, offset]
+        self.index[lanes] = ip + 2
+
+    def _halt(self, lanes, ip, words):
+        self.finished[lanes] = True
+        self.index[lanes] = ip + 1
+
+    HANDLERS = {
+        1: _sum,
+        2: _product,
+        3: _input,
+        4: _output,
+        5: _jump_if_true,
+        6: _jump_if_false,
+        7: _less_than,
+        8: _equals,
+        9: _adjust_relative_base,
+        99: _halt,
+    }
@@ -0,0 +1,261 @@
+"""
+Benchmark suite for the Intcode engines.
+
+    python intcode_benchmark.py --output results.json
+    python intcode_benchmark.py --baseline results.json --threshold 0.15
+
+Every workload is run on every engine. The steps of a workload are counted once with a tracer, its
+wall time is the best of --repeat runs, and the peak RSS and allocations are measured in separate
+runs. Each of these runs in a fresh process, so the peak RSS is that of one plain run of the engine:
+neither other workloads nor the tracer or tracemalloc leak into it.
+With --baseline the exit status is 1 when a workload is more than --threshold slower than before.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from amplifier_search import AmplifierSearch, MemoizedAmplifierSearch
+from intcode_compiler import CompiledIntcodeComputer
+from intcode_computer import IntcodeComputer
+from intcode_loader import load_program
+from intcode_trace import Tracer
+
+SCHEMA_VERSION = 1
+
+ENGINES = {
+    'interpreter': IntcodeComputer,
+    'fused': partial(IntcodeComputer, fuse=True),
+    'compiled': CompiledIntcodeComputer,
+}
+
+
+class Workload(NamedTuple):
+    name: str
+    # Runs the workload on an engine (a callable that builds a computer from a program)
+    run: Callable
+    expected: object
+
+
+class StepCounter(Tracer):
+    def __init__(self):
+        self.steps = 0
+
+    def on_step(self, computer, index: int, instruction: int):
+        self.steps += 1
+
+
+def countdown_loop(n: int) -> List[int]:
+    """Two instructions per iteration: decrement a counter and jump back while it is not zero."""
+    return [1001, 9, -1, 9, 1005, 9, 0, 99, 0, n]
+
+
+def relative_loop(n: int) -> List[int]:
+    """Walks the relative base up through memory, every cell one more than the previous one."""
+    return [109, 50, 109, 1, 22101, 1, -1, 0, 1001, 18, -1, 18, 1005, 18, 2, 204, 0, 99, n]
+
+
+def large_address_loop(n: int, stride: int = 1000003) -> List[int]:
+    """Writes the counter to addresses stride apart, every write touches a new page."""
+    return [109, stride, 21001, 16, 0, 0, 1001, 16, -1, 16, 1005, 16, 0, 204, 0, 99, n]
+
+
+def _run_program(program, inputs, engine):
+    return engine(program).run(*inputs)
+
+
+def _search(program, phases, feedback, engine):
+    return AmplifierSearch(program, phases=phases, feedback=feedback, engine=engine, workers=1).run()
+
+
+def _memoized_search(program, phases, feedback, engine):
+    return MemoizedAmplifierSearch(program, phases=phases, feedback=feedback, engine=engine).run()
+
+
+def _self_tests(engine):
+    from test_intcodeComputer import TestIntcodeComputer as tests
+    outputs = []
+    for _ in range(5):
+        for program in (tests.DAY_5_MEMORY_1, tests.DAY_5_MEMORY_2):
+            outputs.extend(engine(program).run(value) for value in (0, 1, 2))
+        for name, program in [('Day 7 test 1', tests.DAY_7_MEMORY_1),
+                              ('Day 7 test 2', tests.DAY_7_MEMORY_2),
+                              ('Day 7 test 3', tests.DAY_7_MEMORY_3)]:
+            phase_setting, output = _search(program, range(5), False, engine)
+            outputs.append(tests.DAY_7_EXPECTED_OUTCOMES[name] == (phase_setting, output))
+    return outputs == [0, 1, 1, 0, 1, 1, True, True, True] * 5
+
+
+def workloads() -> List[Workload]:
+    boost = load_program('./day9input')
+    amplifiers = load_program('./day7input')
+    return [
+        Workload('day9-boost-test', partial(_run_program, boost, [1]), 2955820355),
+        Workload('day9-boost-sensor', partial(_run_program, boost, [2]), 46643),
+        Workload('day7-search', partial(_search, amplifiers, range(5), False), ((2, 4, 1, 0, 3), 17406)),
+        Workload('day7-search-feedback', partial(_search, amplifiers, range(5, 10), True), ((7, 8, 6, 9, 5), 1047153)),
+        Workload('day7-memoized-search', partial(_memoized_search, amplifiers, range(5), False),
+                 ((2, 4, 1, 0, 3), 17406)),
+        Workload('day7-memoized-search-feedback', partial(_memoized_search, amplifiers, range(5, 10), True),
+                 ((7, 8, 6, 9, 5), 1047153)),
+        Workload('self-tests', _self_tests, True),
+        Workload('synthetic-jumps', partial(_run_program, countdown_loop(100000), []), None),
+        Workload('synthetic-relative', partial(_run_program, relative_loop(50000), []), 50000),
+        Workload('synthetic-large-address', partial(_run_program, large_address_loop(2000), []), 1),
+    ]
+
+
+def _peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in KiB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _workload(name: str) -> Workload:
+    return next(workload for workload in workloads() if workload.name == name)
+
+
+def _check(workload: Workload, engine_name: str, result):
+    if workload.expected is not None and result != workload.expected:
+        raise ValueError(f'{workload.name} on {engine_name}: expected {workload.expected}, got {result}')
+
+
+def count_steps(name: str) -> int:
+    """The number of executed instructions, which depends on the program only, counted on the interpreter."""
+    workload = _workload(name)
+    counter = StepCounter()
+    _check(workload, 'interpreter', workload.run(partial(IntcodeComputer, tracer=counter)))
+    return counter.steps
+
+
+def best_time(name: str, engine_name: str, repeat: int) -> float:
+    workload = _workload(name)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = workload.run(ENGINES[engine_name])
+        times.append(time.perf_counter() - start)
+        _check(workload, engine_name, result)
+    return min(times)
+
+
+def peak_allocated(name: str, engine_name: str) -> int:
+    workload = _workload(name)
+    tracemalloc.start()
+    try:
+        workload.run(ENGINES[engine_name])
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def peak_rss(name: str, engine_name: str) -> Optional[int]:
+    """Peak RSS in KiB of one run, only meaningful in a process that ran nothing else."""
+    workload = _workload(name)
+    _check(workload, engine_name, workload.run(ENGINES[engine_name]))
+    return _peak_rss()
+
+
+def _in_fresh_process(function: Callable, *args):
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(function, *args).result()
+
+
+def measure(name: str, engine_name: str, repeat: int, steps: int) -> Dict[str, object]:
+    """
+    Time, peak RSS and peak allocations of a workload on an engine, each in a fresh process: the
+    tracer and tracemalloc would otherwise add their own memory to the peak RSS.
+    """
+    wall_time = _in_fresh_process(best_time, name, engine_name, repeat)
+    return {
+        'steps': steps,
+        'wall_time': round(wall_time, 6),
+        'steps_per_sec': round(steps / wall_time) if wall_time else None,
+        'peak_rss_kib': _in_fresh_process(peak_rss, name, engine_name),
+        'peak_allocated_bytes': _in_fresh_process(peak_allocated, name, engine_name),
+    }
+
+
+def run_benchmarks(names: Optional[List[str]] = None, engines: Optional[List[str]] = None,
+                   repeat: int = 3) -> Dict[str, object]:
+    results = {}
+    for workload in workloads():
+        if names and workload.name not in names:
+            continue
+        steps = _in_fresh_process(count_steps, workload.name)
+        for engine_name in engines or ENGINES:
+            results[f'{workload.name}/{engine_name}'] = measure(workload.name, engine_name, repeat, steps)
+    return {
+        'schema': SCHEMA_VERSION,
+        'python': platform.python_version(),
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], threshold: float) -> List[str]:
+    """Return a message for every workload that is more than threshold slower than in the baseline."""
+    regressions = []
+    for key, result in sorted(current['results'].items()):
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        if result['wall_time'] > before['wall_time'] * (1 + threshold):
+            regressions.append(f'{key}: {before["wall_time"]:.4f}s -> {result["wall_time"]:.4f}s '
+                               f'({result["wall_time"] / before["wall_time"] - 1:+.1%})')
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the Intcode engines.')
+    parser.add_argument('workloads', nargs='*', help='names of the workloads to run (default: all)')
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES), help='engine to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per workload, the best one counts')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='allowed slowdown relative to the baseline (default: 0.10)')
+    parser.add_argument('--list', action='store_true', help='list the workloads and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for workload in workloads():
+            print(workload.name)
+        return 0
+
+    current = run_benchmarks(args.workloads, args.engine, args.repeat)
+    for key, result in current['results'].items():
+        print(f'{key:40} {result["wall_time"]:9.4f}s {result["steps"]:10} steps '
+              f'{result["steps_per_sec"] or 0:12,} steps/s {result["peak_rss_kib"] or 0:8} KiB RSS '
+              f'{result["peak_allocated_bytes"]:12,} B allocated')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,346 @@
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from intcode_computer import PARAMETER_COUNTS, WRITES, IntcodeComputer, decode
+from intcode_disassembler import ProgramAnalysis
+
+Segments = List[Tuple[int, int]]
+
+
+class CompiledIntcodeComputer(IntcodeComputer):
+    """
+    IntcodeComputer that translates basic blocks into generated Python functions with the parameter
+    modes resolved at compile time. A block runs until input, halt or a jump to a computed address;
+    conditional jumps leave the block early and unconditional jumps to a constant address are
+    followed. A write into compiled code drops the affected blocks so they are recompiled, or
+    interpreted once they keep changing.
+
+    When static analysis proves the program never writes into its own code, blocks are compiled
+    without those checks. A write into the code from outside the program (write() before run(), or
+    restoring a state of another program) turns the checks back on.
+
+    Every block call is one step, and blocks add the instructions they executed to instructions.
+    """
+    MAX_BLOCK_INSTRUCTIONS = 256
+    MAX_RECOMPILES = 8
+
+    def __init__(self, initial_memory, *args, **kwargs):
+        analysis = ProgramAnalysis(initial_memory)
+        self._constant_code = analysis.code if analysis.code_is_constant else None
+        super().__init__(initial_memory, *args, **kwargs)
+
+    def _memory_replaced(self):
+        super()._memory_replaced()
+        self._checked = self._constant_code is None
+        # start address -> compiled block
+        self._blocks: Dict[int, Callable] = {}
+        # start address -> address ranges the block was compiled from
+        self._block_segments: Dict[int, Segments] = {}
+        self._compile_counts: Dict[int, int] = {}
+        # Non-zero for every image cell that compiled (or interpreted) code depends on
+        self._code_mask = bytearray(len(self.memory.dense))
+
+    def restore(self, state):
+        super().restore(state)
+        if not self._checked and not self._holds_analysed_code():
+            # A state of another program, or one whose code was changed from outside
+            self._checked = True
+
+    def _holds_analysed_code(self) -> bool:
+        image = self._image
+        memory = self.memory
+        return all(memory[address] == image[address] for address, kind in enumerate(self._constant_code) if kind)
+
+    def fork(self) -> 'CompiledIntcodeComputer':
+        other = super().fork()
+        other._blocks = dict(self._blocks)
+        other._block_segments = dict(self._block_segments)
+        other._compile_counts = dict(self._compile_counts)
+        other._code_mask = bytearray(self._code_mask)
+        return other
+
+    def write(self, ptr: int, value: int):
+        super().write(ptr, value)
+        if not self._checked and 0 <= ptr < len(self._constant_code) and self._constant_code[ptr]:
+            # The program itself never does this, so the analysis no longer holds
+            self._checked = True
+            self._drop_blocks()
+        mask = self._code_mask
+        if len(mask) != len(self.memory.dense):
+            # The flat part of memory grew, recompile so blocks address the new cells directly
+            mask.extend(bytes(len(self.memory.dense) - len(mask)))
+            self._drop_blocks()
+            self._compile_counts.clear()
+        elif 0 <= ptr < len(mask) and mask[ptr]:
+            self._invalidate(ptr)
+
+    def _drop_blocks(self):
+        self._blocks.clear()
+        self._block_segments.clear()
+
+    def _invalidate(self, ptr: int):
+        self._decoded.pop(ptr, None)
+        stale = [start for start, segments in self._block_segments.items()
+                 if any(first <= ptr < end for first, end in segments)]
+        if not stale:
+            return
+        for start in stale:
+            del self._blocks[start]
+            del self._block_segments[start]
+        mask = self._code_mask
+        mask[:] = bytes(len(mask))
+        for segments in self._block_segments.values():
+            for first, end in segments:
+                mask[first:end] = b'\x01' * (end - first)
+        for address in self._decoded:
+            if address < len(mask):
+                mask[address] = 1
+
+    def _compile(self, ip: int) -> Optional[Callable]:
+        dense = self.memory.dense
+        count = self._compile_counts.get(ip, 0)
+        if count >= self.MAX_RECOMPILES:
+            return None
+        segments = scan_block(dense, ip, self.MAX_BLOCK_INSTRUCTIONS)
+        if not segments:
+            return None
+        self._compile_counts[ip] = count + 1
+        block = compile_block(tuple((first, tuple(dense[first:end])) for first, end in segments), len(dense),
+                              self._checked)
+        self._blocks[ip] = block
+        self._block_segments[ip] = segments
+        for first, end in segments:
+            self._code_mask[first:end] = b'\x01' * (end - first)
+        return block
+
+    def _fuse(self, index: int, opcode: int, modes: Tuple[int, int, int]):
+        # Blocks are specialized already, and the code mask only knows single instructions
+        return None
+
+    def _interpret_step(self, ip: int) -> int:
+        if 0 <= ip < len(self._code_mask):
+            self._code_mask[ip] = 1
+        self.index = ip
+        self.process_step()
+        return self.index
+
+    def _run_fast(self, until_output: bool = False, max_steps: Optional[int] = None):
+        if max_steps is not None:
+            self._run_limited(until_output, max_steps)
+            return
+        memory = self.memory
+        # Compiled blocks write the flat part directly, bypassing copy-on-write
+        dense = memory.own_dense()
+        mask = self._code_mask
+        blocks = self._blocks
+        ip = self.index
+        # Every block call is a step, and so is every instruction interpreted (which process_step counts too)
+        steps = 0
+        start_steps = self.steps
+        try:
+            while not (self.finished or self.halted or until_output and self.output_values):
+                steps += 1
+                block = blocks.get(ip)
+                if block is None:
+                    block = self._compile(ip)
+                    if block is None:
+                        ip = self._interpret_step(ip)
+                        continue
+                ip = block(self, dense, memory, mask)
+                # Blocks stay in this loop until they halt or wait for input, which they signal with ~ip
+                while ip >= 0:
+                    if until_output and self.output_values:
+                        break
+                    block = blocks.get(ip)
+                    if block is None:
+                        break
+                    steps += 1
+                    ip = block(self, dense, memory, mask)
+                else:
+                    ip = ~ip
+        finally:
+            self.steps = start_steps + steps
+        self.index = ip
+
+    def _run_limited(self, until_output: bool, max_steps: int):
+        """_run_fast for at most max_steps steps."""
+        memory = self.memory
+        dense = memory.own_dense()
+        mask = self._code_mask
+        blocks = self._blocks
+        ip = self.index
+        steps = 0
+        start_steps = self.steps
+        try:
+            while not (self.finished or self.halted or until_output and self.output_values) and steps < max_steps:
+                steps += 1
+                block = blocks.get(ip)
+                if block is None:
+                    block = self._compile(ip)
+                    if block is None:
+                        ip = self._interpret_step(ip)
+                        continue
+                ip = block(self, dense, memory, mask)
+                while ip >= 0:
+                    if steps == max_steps or until_output and self.output_values:
+                        break
+                    block = blocks.get(ip)
+                    if block is None:
+                        break
+                    steps += 1
+                    ip = block(self, dense, memory, mask)
+                else:
+                    ip = ~ip
+        finally:
+            self.steps = start_steps + steps
+        self.index = ip
+
+
+def _always_taken(opcode: int, modes: Tuple[int, int, int], condition: int) -> Optional[bool]:
+    """Whether a jump with an immediate condition is always (True) or never (False) taken."""
+    if modes[0] != 1:
+        return None
+    return bool(condition) == (opcode == 5)
+
+
+def scan_block(dense: List[int], start: int, max_instructions: int) -> Segments:
+    """Return the address ranges (start, exclusive end) of the block that starts at start."""
+    segments = []
+    first = ip = start
+    n = len(dense)
+    for _ in range(max_instructions):
+        if not 0 <= ip < n or dense[ip] < 0:
+            break
+        opcode, modes = decode(dense[ip])
+        if opcode not in PARAMETER_COUNTS:
+            break
+        length = PARAMETER_COUNTS[opcode] + 1
+        if ip + length > n:
+            break
+        used_modes = modes[:PARAMETER_COUNTS[opcode]]
+        if any(mode not in (0, 1, 2) for mode in used_modes) or opcode in WRITES and used_modes[-1] == 1:
+            # Invalid modes, leave it to the interpreter to raise
+            break
+        ip += length
+        if opcode in (3, 99):
+            break
+        if opcode in (5, 6) and _always_taken(opcode, modes, dense[ip - 2]):
+            if modes[1] != 1:
+                break
+            # Follow the jump to its constant target, unless that closes a loop
+            segments.append((first, ip))
+            target = dense[ip - 1]
+            if not 0 <= target < n or any(s <= target < e for s, e in segments):
+                return segments
+            first = ip = target
+    if ip > first:
+        segments.append((first, ip))
+    return segments
+
+
+def _read(mode: int, param: int, n: int) -> str:
+    if mode == 1:
+        return repr(param)
+    if mode == 0:
+        return f'd[{param}]' if 0 <= param < n else f'm[{param}]'
+    if mode == 2:
+        return f'(d[a] if 0 <= (a := rb + {param}) < {n} else m[a])'
+    raise ValueError(f'Unknown mode {mode}')
+
+
+def _leave(executed: int) -> str:
+    """Code to run before leaving a block: store the relative base and count the instructions it executed."""
+    return f'vm.relative_base = rb; vm.instructions += {executed}' if executed else 'vm.relative_base = rb'
+
+
+def _write(mode: int, param: int, value: str, n: int, next_ip: int, lines: List[str], checked: bool, leave: str):
+    if mode == 0 and 0 <= param < n:
+        lines.append(f'    d[{param}] = {value}')
+        if checked:
+            lines.append(f'    if cm[{param}]:')
+            lines.append(f'        vm._invalidate({param}); {leave}; return {next_ip}')
+        return
+    address = repr(param) if mode == 0 else f'rb + {param}'
+    lines.append(f'    w = {address}')
+    lines.append(f'    if 0 <= w < {n}:')
+    lines.append(f'        d[w] = {value}')
+    if checked:
+        lines.append('        if cm[w]:')
+        lines.append(f'            vm._invalidate(w); {leave}; return {next_ip}')
+    lines.append('    else:')
+    lines.append(f'        vm.write(w, {value})')
+
+
+@lru_cache(maxsize=65536)
+def compile_block(segments: Tuple[Tuple[int, Tuple[int, ...]], ...], n: int, checked: bool = True) -> Callable:
+    """
+    Generate the function for a block, given as (address, instruction words) segments. The function
+    returns the address to continue at, or ~address when the computer halted or waits for input.
+    Without checked, writes do not look for compiled code to invalidate. The function adds the
+    instructions it executed to vm.instructions.
+    """
+    start = segments[0][0]
+    lines = [f'def block_{start}(vm, d, m, cm):', '    rb = vm.relative_base']
+    returned = False
+    executed = 0
+    for segment_index, (first, words) in enumerate(segments):
+        next_segment = segments[segment_index + 1][0] if segment_index + 1 < len(segments) else None
+        offset = 0
+        while offset < len(words):
+            ip = first + offset
+            opcode, modes = decode(words[offset])
+            params = words[offset + 1:offset + 1 + PARAMETER_COUNTS[opcode]]
+            next_ip = ip + 1 + len(params)
+            offset = next_ip - first
+            lines.append(f'    # {ip}: {words[ip - first:offset]}')
+            returned = False
+            executed += 1
+
+            if opcode in (1, 2, 7, 8):
+                a = _read(modes[0], params[0], n)
+                b = _read(modes[1], params[1], n)
+                value = {
+                    1: f'{a} + {b}',
+                    2: f'{a} * {b}',
+                    7: f'1 if {a} < {b} else 0',
+                    8: f'1 if {a} == {b} else 0',
+                }[opcode]
+                lines.append(f'    v = {value}')
+                _write(modes[2], params[2], 'v', n, next_ip, lines, checked, _leave(executed))
+            elif opcode == 3:
+                lines.append('    if not vm._inputs:')
+                # The input instruction runs again once there is input, so it does not count yet
+                lines.append(f'        vm.halted = True; {_leave(executed - 1)}; return {~ip}')
+                lines.append('    v = vm._inputs.popleft()')
+                lines.append('    vm.inputs_consumed += 1')
+                _write(modes[0], params[0], 'v', n, next_ip, lines, checked, _leave(executed))
+            elif opcode == 4:
+                lines.append(f'    vm._push_output({_read(modes[0], params[0], n)})')
+                lines.append('    vm.outputs_produced += 1')
+            elif opcode in (5, 6):
+                taken = _always_taken(opcode, modes, params[0])
+                target = _read(modes[1], params[1], n)
+                if taken is None:
+                    condition = _read(modes[0], params[0], n)
+                    test = condition if opcode == 5 else f'not {condition}'
+                    lines.append(f'    if {test}:')
+                    lines.append(f'        {_leave(executed)}; return {target}')
+                elif taken and not (offset == len(words) and next_segment == params[1] and modes[1] == 1):
+                    lines.append(f'    {_leave(executed)}')
+                    lines.append(f'    return {target}')
+                    returned = True
+            elif opcode == 9:
+                lines.append(f'    rb += {_read(modes[0], params[0], n)}')
+            elif opcode == 99:
+                lines.append(f'    vm.finished = True; {_leave(executed)}')
+                lines.append(f'    return {~next_ip}')
+                returned = True
+
+    if not returned:
+        first, words = segments[-1]
+        lines.append(f'    {_leave(executed)}')
+        lines.append(f'    return {first + len(words)}')
+
+    namespace = {}
+    exec(compile('\n'.join(lines), f'<intcode block {start}>', 'exec'), namespace)
+    return namespace[f'block_{start}']
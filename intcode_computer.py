@@ -1,40 +1,189 @@
-import logging
-from copy import deepcopy
-from typing import overload, Iterable, List
+import sys
+import time
+from collections import deque
+from copy import copy
+from itertools import count
+from typing import (TYPE_CHECKING, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple,
+                    Union)
+
+from intcode_trace import LoggingTracer, Tracer
+
+if TYPE_CHECKING:
+    # intcode_profile imports the opcode tables from here
+    from intcode_profile import Profiler
+
+class ComputerMemory:
+    """
+    Intcode memory. The program image is kept as a flat list, every address beyond it lives in
+    fixed-size pages that are only allocated once a non-zero value is written to them. Writes just
+    past the flat part (typically the stack) grow it instead.
+
+    copy() is copy-on-write: the copies share the flat part and the pages until one of them writes,
+    so many forks of one computer cost little more than the cells they change.
+    """
+    PAGE_BITS = 10
+    PAGE_SIZE = 1 << PAGE_BITS
+    PAGE_MASK = PAGE_SIZE - 1
+    # Writes this close past the flat part extend it instead of allocating a page
+    DENSE_GROWTH = 4 * PAGE_SIZE
+
+    def __init__(self, image: Iterable[int] = (), max_cells: Optional[int] = None):
+        # A memoryview (such as a memory-mapped image) is used as it is, until the first write copies it
+        self.dense: List[int] = image if isinstance(image, memoryview) else list(image)
+        self.pages: Dict[int, List[int]] = {}
+        self.max_cells = max_cells
+        # Backing lists that other copies still refer to and must be copied before writing
+        self._dense_shared = isinstance(image, memoryview)
+        self._shared_pages: Set[int] = set()
+
+    def copy(self) -> 'ComputerMemory':
+        other = ComputerMemory.__new__(ComputerMemory)
+        other.dense = self.dense
+        other.pages = dict(self.pages)
+        other.max_cells = self.max_cells
+        self._dense_shared = other._dense_shared = True
+        self._shared_pages = set(self.pages)
+        other._shared_pages = set(self.pages)
+        return other
+
+    def own_dense(self) -> List[int]:
+        """Make sure the flat part is not shared with a copy, so it may be written directly."""
+        if self._dense_shared:
+            self.dense = self.dense.tolist() if isinstance(self.dense, memoryview) else list(self.dense)
+            self._dense_shared = False
+        return self.dense
+
+    def __getitem__(self, i: int) -> int:
+        dense = self.dense
+        if 0 <= i < len(dense):
+            return dense[i]
+        if i < 0:
+            raise IndexError(f'Negative memory address {i}')
+        page = self.pages.get(i >> self.PAGE_BITS)
+        if page is None:
+            return 0
+        return page[i & self.PAGE_MASK]
+
+    def __setitem__(self, i: int, o: int) -> None:
+        dense = self.dense
+        if 0 <= i < len(dense):
+            if self._dense_shared:
+                dense = self.own_dense()
+            dense[i] = o
+            return
+        if i < 0:
+            raise IndexError(f'Negative memory address {i}')
+        p = i >> self.PAGE_BITS
+        page = self.pages.get(p)
+        if page is None:
+            if not o:
+                # Untouched cells already read as 0
+                return
+            if i < len(dense) + self.DENSE_GROWTH:
+                self._grow(i)
+                self.dense[i] = o
+                return
+            self._check_limit(i, self.PAGE_SIZE)
+            page = self.pages[p] = [0] * self.PAGE_SIZE
+        elif p in self._shared_pages:
+            page = self.pages[p] = list(page)
+            self._shared_pages.discard(p)
+        page[i & self.PAGE_MASK] = o
+
+    def _check_limit(self, i: int, cells: int):
+        if self.max_cells is not None and self.resident_cells + cells > self.max_cells:
+            raise MemoryError(f'Writing address {i} exceeds the memory limit of {self.max_cells} cells')
+
+    def _grow(self, i: int):
+        """Extend the flat part in place up to the page holding address i, absorbing the pages it covers."""
+        dense = self.own_dense()
+        old_size = len(dense)
+        new_size = ((i >> self.PAGE_BITS) + 1) << self.PAGE_BITS
+        absorbed = [p for p in self.pages if p << self.PAGE_BITS < new_size]
+        self._check_limit(i, new_size - old_size - len(absorbed) * self.PAGE_SIZE)
+        dense.extend([0] * (new_size - old_size))
+        for p in absorbed:
+            page = self.pages.pop(p)
+            self._shared_pages.discard(p)
+            first = max(p << self.PAGE_BITS, old_size)
+            offset = p << self.PAGE_BITS
+            dense[first:offset + self.PAGE_SIZE] = page[first - offset:]
+
+    def __len__(self):
+        if self.pages:
+            return max(len(self.dense), (max(self.pages) + 1) << self.PAGE_BITS)
+        return len(self.dense)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def resident_cells(self) -> int:
+        return len(self.dense) + len(self.pages) * self.PAGE_SIZE
+
+    def resident_bytes(self) -> int:
+        """Bytes held by the backing lists (pointer storage, the small int objects themselves are shared)."""
+        return sys.getsizeof(self.dense) + sum(sys.getsizeof(page) for page in self.pages.values())
+
+    def __repr__(self):
+        return f"<ComputerMemory: {len(self.dense)} image cells, {len(self.pages)} pages>"
+
+
+# Number of parameters per opcode
+PARAMETER_COUNTS = {1: 3, 2: 3, 3: 1, 4: 1, 5: 2, 6: 2, 7: 3, 8: 3, 9: 1, 99: 0}
+OPCODE_NAMES = {1: 'add', 2: 'mul', 3: 'in', 4: 'out', 5: 'jnz', 6: 'jz', 7: 'lt', 8: 'eq', 9: 'arb', 99: 'halt'}
+# Opcodes whose last parameter is an address to write to
+WRITES = {1, 2, 3, 7, 8}
 
-logger = logging.getLogger(__name__)
 
-class ComputerMemory(list):
-    _T = None
-    @overload
-    def __setitem__(self, i: int, o: _T) -> None: ...
+class Instruction(NamedTuple):
+    opcode: int
+    modes: Tuple[int, int, int]
 
-    @overload
-    def __setitem__(self, s: slice, o: Iterable[_T]) -> None: ...
 
-    def __setitem__(self, i: int, o: _T) -> None:
-        if len(self) < i + 1:
-            while len(self) < i + 1:
-                self.append(0)
-        super().__setitem__(i, o)
+def decode(word: int) -> Instruction:
+    """Split a raw instruction word such as 1002 into its opcode (2) and parameter modes (0, 1, 0)."""
+    if word < 0:
+        raise ValueError(f'unknown_opcode: {word}')
+    return Instruction(word % 100, (word // 100 % 10, word // 1000 % 10, word // 10000 % 10))
 
-    @overload
-    def __getitem__(self, i: int) -> _T: ...
 
-    @overload
-    def __getitem__(self, s: slice) -> List[_T]: ...
+def _always_jumps(word: int, condition: int) -> bool:
+    """Whether the instruction word with this first parameter is a jump to an immediate address that is always taken."""
+    return word == 1105 and condition != 0 or word == 1106 and condition == 0
 
-    def __getitem__(self, i: int) -> _T:
-        if len(self) < i + 1:
-            while len(self) < i + 1:
-                self.append(0)
-        return super().__getitem__(i)
+
+class ComputerState(NamedTuple):
+    index: int
+    relative_base: int
+    input_values: Tuple[int, ...]
+    output_values: Tuple[int, ...]
+    halted: bool
+    finished: bool
+    memory: ComputerMemory
 
 
 class IntcodeComputer:
 
-    def __init__(self, initial_memory):
+    OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, RAISE) = ('drop_oldest', 'drop_newest', 'raise')
+    # What run_slice() stopped for: the program finished, waits for input, or used up its budget
+    STATUSES = (FINISHED, WAITING, PAUSED) = ('finished', 'waiting', 'paused')
+    # Steps between looking at the clock when running to a deadline
+    DEADLINE_CHECK_STEPS = 1000
+
+    def __init__(self, initial_memory, memory_limit: Optional[int] = None, tracer: Optional[Tracer] = None,
+                 trace: bool = False, output_limit: Optional[int] = None, overflow: str = DROP_OLDEST,
+                 profiler: Optional['Profiler'] = None, fuse: bool = False):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {overflow}')
         self.initial_memory = initial_memory
+        self.memory_limit = memory_limit
+        # With an output limit the outputs are kept in a ring buffer of that size
+        self.output_limit = output_limit
+        self.overflow = overflow
+        # Every reset starts from a copy-on-write copy of this image
+        self._image = ComputerMemory(initial_memory, max_cells=memory_limit)
         self.memory = ComputerMemory([])
         self.index = 0
         self.input_values = []
@@ -42,142 +191,495 @@ class IntcodeComputer:
         self.halted = False
         self.finished = False
         self.relative_base = 0
+        self.inputs_consumed = 0
+        self.outputs_produced = 0
+        # Dispatches (an instruction, superinstruction or compiled block) and Intcode instructions executed.
+        # An input instruction that stops for input is a step, but only counts as an instruction once it completes.
+        self.steps = 0
+        self.instructions = 0
+        # Modes of the input instruction the computer halted on, which _resume() completes
+        self._pending_input = None
+        # address -> (handler, modes), filled lazily the first time an instruction is executed
+        self._decoded = {}
+        # With fuse, common instruction sequences are decoded into one superinstruction (not while tracing).
+        # Decoding takes longer, so it pays off for programs that loop rather than run straight through.
+        self.fuse = fuse
+        # pattern -> number of sequences fused
+        self.fusion_stats: Dict[str, int] = {}
+        # Tracing is opt-in, without a tracer run() takes a loop that does no logging at all
+        if tracer is None and trace:
+            tracer = LoggingTracer()
+        self.tracer = tracer
+        # Like a tracer, a profiler makes run() take the step-by-step loop
+        self.profiler = profiler
 
         self.reset()
 
     def reset(self):
-        self.memory = ComputerMemory(deepcopy(self.initial_memory))
+        self.memory = self._image.copy()
         self.index = 0
         self.input_values = []
         self.output_values = []
         self.halted = False
         self.finished = False
         self.relative_base = 0
+        self.inputs_consumed = 0
+        self.outputs_produced = 0
+        self.steps = 0
+        self.instructions = 0
+        self._pending_input = None
+        self._memory_replaced()
+
+    @property
+    def input_values(self) -> Deque[int]:
+        return self._inputs
+
+    @input_values.setter
+    def input_values(self, values: Iterable[int]):
+        self._inputs = deque(values)
+
+    @property
+    def output_values(self) -> Deque[int]:
+        return self._outputs
+
+    @output_values.setter
+    def output_values(self, values: Iterable[int]):
+        if self.output_limit is not None and self.overflow == self.DROP_OLDEST:
+            self._outputs = deque(values, maxlen=self.output_limit)
+        else:
+            self._outputs = deque(values)
+        if self.output_limit is None or self.overflow == self.DROP_OLDEST:
+            self._push_output = self._outputs.append
+        else:
+            self._push_output = self._push_bounded_output
+
+    def _push_bounded_output(self, value: int):
+        if len(self._outputs) < self.output_limit:
+            self._outputs.append(value)
+        elif self.overflow == self.RAISE:
+            raise BufferError(f'Output buffer is full ({self.output_limit} values)')
+
+    def feed(self, *values: int):
+        """Queue input values after the ones that are already waiting."""
+        self._inputs.extend(values)
+
+    def _memory_replaced(self):
+        """Drop everything derived from the contents of memory."""
+        self._decoded = {}
+        # address -> start of the superinstruction that was decoded from it
+        self._fused_cells: Dict[int, int] = {}
+
+    @property
+    def status(self) -> str:
+        if self.finished:
+            return self.FINISHED
+        return self.WAITING if self.halted else self.PAUSED
+
+    def snapshot(self) -> ComputerState:
+        # A state waiting for input points at the input instruction, which runs again after restore()
+        index = self.index - 1 if self._pending_input is not None else self.index
+        return ComputerState(index, self.relative_base, tuple(self.input_values), tuple(self.output_values),
+                             self.halted, self.finished, self.memory.copy())
+
+    def restore(self, state: ComputerState):
+        self.memory = state.memory.copy()
+        self.index = state.index
+        self.relative_base = state.relative_base
+        self.input_values = list(state.input_values)
+        self.output_values = list(state.output_values)
+        self.halted = state.halted
+        self.finished = state.finished
+        self._pending_input = None
+        self._memory_replaced()
+
+    def fork(self) -> 'IntcodeComputer':
+        """An independent computer in the same state, sharing memory with this one until either writes."""
+        other = copy(self)
+        other.memory = self.memory.copy()
+        other.input_values = self.input_values
+        other.output_values = self.output_values
+        other._decoded = dict(self._decoded)
+        other._fused_cells = dict(self._fused_cells)
+        other.fusion_stats = dict(self.fusion_stats)
+        return other
 
     def next_value(self, mode: int = 1):
-        if mode == 2:
-            d_index = self.memory[self.index]
-            val_ptr = self.relative_base + d_index
-            logger.info(f'Next value +{d_index} from relative base {self.relative_base} (mem[{val_ptr}] = {self.memory[val_ptr]})')
-
+        if mode == 0:
+            val = self.memory[self.memory[self.index]]
         elif mode == 1:
-            val_ptr = self.index
-            logger.info(f'Next immediate value mem[{val_ptr}] = {self.memory[val_ptr]})')
-
-        elif mode == 0:
-            val_ptr = self.memory[self.index]
-            logger.info(f'Next position value ptr at mem[{val_ptr}] = {self.memory[val_ptr]})')
-
+            val = self.memory[self.index]
+        elif mode == 2:
+            val = self.memory[self.relative_base + self.memory[self.index]]
         else:
             raise ValueError(f'Unknown mode {mode}')
-        val = self.memory[val_ptr]
         self.index += 1
 
         return val
 
-    def process_step(self):
-        instruction = str(self.next_value())
-        opcode = int(instruction[-2:])
-        modes = [int(x) for x in instruction[:-2][::-1]]
-
-        while len(modes) < 3:
-            modes.append(0)
-
-        if opcode == 99:
-            logger.info(f'End of program {instruction}')
-            # Stop processing
-            self.finished = True
-
-        elif opcode == 1:
-            # Sum
-            a = self.next_value(mode=modes.pop(0))
-            b = self.next_value(mode=modes.pop(0))
-            ptr_out = self.next_value()
-
-            logger.info(f'Sum {a} + {b} = {a+b} stored in {ptr_out}')
-            self.memory[ptr_out] = a + b
+    def next_pointer(self, mode: int = 0):
+        """Read a parameter that names an address to write to, honouring position and relative mode."""
+        ptr = self.memory[self.index]
+        if mode == 2:
+            ptr += self.relative_base
+        elif mode != 0:
+            raise ValueError(f'Invalid mode {mode} for a write parameter')
+        self.index += 1
+        return ptr
+
+    def write(self, ptr: int, value: int):
+        self.memory[ptr] = value
+        # The program wrote over (possibly) decoded code, drop the stale decoding
+        self._decoded.pop(ptr, None)
+        if ptr in self._fused_cells:
+            self._decoded.pop(self._fused_cells.pop(ptr), None)
+
+    def _decode(self, index: int):
+        opcode, modes = decode(self.memory[index])
+        handler = self.HANDLERS.get(opcode)
+        if handler is None:
+            raise ValueError(f'unknown_opcode: {opcode}')
+        if self.fuse and self.tracer is None and self.profiler is None:
+            entry = self._fuse(index, opcode, modes)
+            if entry is not None:
+                return entry
+        self._decoded[index] = entry = (handler, modes)
+        return entry
+
+    def _fuse(self, index: int, opcode: int, modes: Tuple[int, int, int]):
+        """
+        Decode the sequence at index into a superinstruction, if it is one of the fused patterns. Its
+        handler gets the operands read at decode time and sets index itself; a write to any of the
+        words it was decoded from drops it again.
+        """
+        memory = self.memory
+        words = memory.dense[index:index + 7]
+        if len(words) < 7:
+            words = [memory[i] for i in range(index, index + 7)]
+        if opcode in (7, 8) and modes[0] <= 2 and modes[1] <= 2 and modes[2] == 0:
+            # lt/eq into a cell, then jnz/jz on that cell to an immediate address
+            cell = words[3]
+            if words[4] in (1005, 1006) and words[5] == cell and not index <= cell < index + 7:
+                return self._fused(index, 7, 'compare_branch',
+                                   (modes[0], words[1], modes[1], words[2], cell, opcode == 7, words[4] == 1005,
+                                    words[6], index + 7))
+        if opcode == 1 and modes in ((0, 1, 0), (1, 0, 0)) and words[1 + modes[0]] == words[3]:
+            # A cell incremented in place by a constant
+            return self._fused(index, 4, 'increment', (words[3], words[2 - modes[0]], index + 4))
+        if opcode in (1, 2) and modes[:2] == (1, 1) and modes[2] in (0, 2) and _always_jumps(words[4], words[5]):
+            # A constant (the return address) stored, then a jump: a call
+            if modes[2] == 2 or not index <= words[3] < index + 7:
+                value = words[1] + words[2] if opcode == 1 else words[1] * words[2]
+                return self._fused(index, 7, 'call', (modes[2], words[3], value, words[6], index))
+        if opcode in (5, 6) and modes[:2] == (1, 1) and bool(words[1]) == (opcode == 5):
+            return self._fused(index, 3, 'jump', words[2])
+        if opcode == 9 and modes[0] == 1 and words[2] >= 0:
+            next_opcode, next_modes = decode(words[2])
+            if next_opcode in (1, 2, 7, 8) and next_modes[0] <= 2 and next_modes[1] <= 2 and next_modes[2] == 2:
+                # Relative base adjustment followed by an instruction that stores relative to it
+                return self._fused(index, 6, 'relative_store',
+                                   (words[1], next_opcode, next_modes[0], words[3], next_modes[1], words[4], words[5],
+                                    index + 6))
+            if next_opcode in (5, 6) and next_modes[0] == 1 and bool(words[3]) == (next_opcode == 5) \
+                    and next_modes[1] in (0, 2):
+                # Relative base adjustment followed by a jump to a stored address: a return
+                return self._fused(index, 5, 'return', (words[1], next_modes[1], words[4]))
+        return None
+
+    def _fused(self, index: int, length: int, pattern: str, operands: tuple):
+        cells = range(index, index + length)
+        if any(cell in self._fused_cells for cell in cells):
+            return None
+        for cell in cells:
+            self._fused_cells[cell] = index
+        self.fusion_stats[pattern] = self.fusion_stats.get(pattern, 0) + 1
+        self._decoded[index] = entry = (self.FUSED_HANDLERS[pattern], operands)
+        return entry
+
+    @property
+    def fused_instructions(self) -> int:
+        """Number of instructions that were decoded as part of a superinstruction."""
+        return sum(count * self.FUSED_INSTRUCTIONS[pattern] for pattern, count in self.fusion_stats.items())
+
+    def _halt(self, modes):
+        # Stop processing
+        self.finished = True
+
+    def _sum(self, modes):
+        a = self.next_value(mode=modes[0])
+        b = self.next_value(mode=modes[1])
+        self.write(self.next_pointer(mode=modes[2]), a + b)
+
+    def _product(self, modes):
+        a = self.next_value(mode=modes[0])
+        b = self.next_value(mode=modes[1])
+        self.write(self.next_pointer(mode=modes[2]), a * b)
+
+    def _input(self, modes):
+        # Copy input to location
+        if not self._inputs:
+            # Wait for input. The instruction is finished (and counted) by _resume(), without decoding it again
+            self.halted = True
+            self._pending_input = modes
+            self.instructions -= 1
+            return
+
+        self.write(self.next_pointer(mode=modes[0]), self._inputs.popleft())
+        self.inputs_consumed += 1
+
+    def _output(self, modes):
+        self._push_output(self.next_value(mode=modes[0]))
+        self.outputs_produced += 1
+
+    def _jump_if_true(self, modes):
+        jump_if_true = self.next_value(mode=modes[0])
+        jump_to_value = self.next_value(mode=modes[1])
+        if jump_if_true:
+            self.index = jump_to_value
+
+    def _jump_if_false(self, modes):
+        jump_if_false = self.next_value(mode=modes[0])
+        jump_to_value = self.next_value(mode=modes[1])
+        if not jump_if_false:
+            self.index = jump_to_value
+
+    def _less_than(self, modes):
+        a = self.next_value(mode=modes[0])
+        b = self.next_value(mode=modes[1])
+        self.write(self.next_pointer(mode=modes[2]), 1 if a < b else 0)
+
+    def _equals(self, modes):
+        a = self.next_value(mode=modes[0])
+        b = self.next_value(mode=modes[1])
+        self.write(self.next_pointer(mode=modes[2]), 1 if a == b else 0)
+
+    def _adjust_relative_base(self, modes):
+        self.relative_base += self.next_value(mode=modes[0])
+
+    def _read(self, mode: int, parameter: int) -> int:
+        if mode == 0:
+            return self.memory[parameter]
+        if mode == 2:
+            return self.memory[self.relative_base + parameter]
+        return parameter
+
+    def _compare_branch(self, operands):
+        self.instructions += 1
+        mode_a, a, mode_b, b, cell, less_than, jump_if_true, target, next_index = operands
+        a = self._read(mode_a, a)
+        b = self._read(mode_b, b)
+        result = a < b if less_than else a == b
+        self.write(cell, 1 if result else 0)
+        self.index = target if result == jump_if_true else next_index
+
+    def _increment(self, operands):
+        address, step, next_index = operands
+        self.write(address, self.memory[address] + step)
+        self.index = next_index
+
+    def _call(self, operands):
+        mode, c, value, target, start = operands
+        address = c + self.relative_base if mode == 2 else c
+        self.write(address, value)
+        # Unless the store changed the jump, which then runs (and counts) on its own
+        if start <= address < start + 7:
+            self.index = start + 4
+        else:
+            self.index = target
+            self.instructions += 1
+
+    def _jump(self, target):
+        self.index = target
+
+    def _return(self, operands):
+        self.instructions += 1
+        offset, mode, c = operands
+        self.relative_base += offset
+        self.index = self._read(mode, c)
+
+    def _relative_store(self, operands):
+        self.instructions += 1
+        offset, opcode, mode_a, a, mode_b, b, c, next_index = operands
+        self.relative_base += offset
+        a = self._read(mode_a, a)
+        b = self._read(mode_b, b)
+        if opcode == 1:
+            value = a + b
         elif opcode == 2:
-            # Product
-            a = self.next_value(mode=modes.pop(0))
-            b = self.next_value(mode=modes.pop(0))
-            ptr_out = self.next_value()
-
-            logger.info(f'Product {a} * {b} = {a*b} stored in {ptr_out}')
-            self.memory[ptr_out] = a * b
-        elif opcode == 3:
-            # Copy input to location
-            if len(self.input_values) == 0:
-                self.halted = True
-                self.index -= 1  # Rewind to before receiving this instruction
-                # logging.warning('Interupting processing until new input is supplied and program is resumed')
-                return
-
-            ptr_out = self.next_value()
-            logger.info(f'Take input {self.input_values[0]} and store it in {ptr_out}')
-            self.memory[ptr_out] = self.input_values.pop(0)
-
-        elif opcode == 4:
-            # Output a value
-            value = self.next_value(mode=modes.pop(0))
-
-            logger.info(f'Take {value} and output it')
-            self.output_values.append(value)
-
-        elif opcode == 5:
-            jump_if_true = self.next_value(mode=modes.pop(0))
-            jump_to_value = self.next_value(mode=modes.pop(0))
-            if jump_if_true:
-                self.index = jump_to_value
-                logger.info(f'Jumped to {jump_to_value} because {jump_if_true} was non-zero')
-            else:
-                logger.info(f'Did not jump address because {jump_if_true} was zero')
-
-        elif opcode == 6:
-            jump_if_false = self.next_value(mode=modes.pop(0))
-            jump_to_value = self.next_value(mode=modes.pop(0))
-            if not jump_if_false:
-                self.index = jump_to_value
-                logger.info(f'Jumped to {jump_to_value} because {jump_if_false} was zero')
-            else:
-                logger.info(f'Did not jump address because {jump_if_false} was nom-zero')
+            value = a * b
         elif opcode == 7:
-            a = self.next_value(mode=modes.pop(0))
-            b = self.next_value(mode=modes.pop(0))
-            ptr_out = self.next_value()
-
-            logger.info(f'Put value {1 if a < b else 0} in {ptr_out} because {a} {"<" if a < b else ">="} {b}')
-            self.memory[ptr_out] = 1 if a < b else 0
-        elif opcode == 8:
-            a = self.next_value(mode=modes.pop(0))
-            b = self.next_value(mode=modes.pop(0))
-            ptr_out = self.next_value()
-
-            logger.info(f'Put value {1 if a < b else 0} in {ptr_out} because {a} {"==" if a == b else "!="} {b}')
-            self.memory[ptr_out] = 1 if a == b else 0
-
-        elif opcode == 9:
-            offset = self.next_value(mode=modes.pop(0))
-            logger.info(f'Relative base moved from {self.relative_base} to {self.relative_base + offset}')
-            self.relative_base += offset
+            value = 1 if a < b else 0
         else:
-            raise ValueError(f'unknown_opcode: {opcode}')
+            value = 1 if a == b else 0
+        self.write(self.relative_base + c, value)
+        self.index = next_index
+
+    HANDLERS = {
+        1: _sum,
+        2: _product,
+        3: _input,
+        4: _output,
+        5: _jump_if_true,
+        6: _jump_if_false,
+        7: _less_than,
+        8: _equals,
+        9: _adjust_relative_base,
+        99: _halt,
+    }
+
+    FUSED_HANDLERS = {
+        'compare_branch': _compare_branch,
+        'increment': _increment,
+        'relative_store': _relative_store,
+        'call': _call,
+        'jump': _jump,
+        'return': _return,
+    }
+    # Number of instructions every superinstruction stands for
+    FUSED_INSTRUCTIONS = {'compare_branch': 2, 'increment': 1, 'relative_store': 2, 'call': 2, 'jump': 1, 'return': 2}
 
-    def run(self, *args):
-        self.input_values = list(args) if args else []
-        if self.halted:
-            self.halted = False
+    def process_step(self):
+        self.steps += 1
+        self.instructions += 1
+        index = self.index
+        decoded = self._decoded.get(index)
+        if decoded is None:
+            decoded = self._decode(index)
+        if self.tracer is not None:
+            self.tracer.on_step(self, index, self.memory[index])
+        handler, modes = decoded
+        self.index = index + 1
+        if self.profiler is not None:
+            self.profiler.profile(self, index, handler, modes)
+        else:
+            handler(self, modes)
 
-        while not (self.finished or self.halted):
-            self.process_step()
-            logger.info('---')
+    def run(self, *args, max_steps: Optional[int] = None, deadline: Optional[float] = None):
+        """
+        Feed args and run until the program finishes or waits for input, or pauses after max_steps
+        steps or at deadline (see run_slice), and return the outputs so far: None, one value or a list.
+        """
+        self.feed(*args)
+        self.run_slice(max_steps, deadline)
 
         if self.output_values:
             if len(self.output_values) > 1:
-                return self.output_values
+                return list(self.output_values)
             else:
                 return self.output_values[0]
         else:
             return None
 
+    def run_slice(self, max_steps: Optional[int] = None, deadline: Optional[float] = None) -> str:
+        """
+        Run until the program finishes or waits for input, for at most max_steps steps, and until
+        time.monotonic() passes deadline (looked at every DEADLINE_CHECK_STEPS steps, so at least
+        that many run), and return the status. A paused computer continues where it stopped.
+        """
+        if not self._resume():
+            return self.WAITING
+        if deadline is None:
+            self._execute(max_steps)
+            return self.status
+
+        done = 0
+        while not (self.finished or self.halted):
+            chunk = self.DEADLINE_CHECK_STEPS
+            if max_steps is not None:
+                chunk = min(chunk, max_steps - done)
+                if chunk <= 0:
+                    break
+            start = self.steps
+            self._execute(chunk)
+            done += self.steps - start
+            if time.monotonic() >= deadline:
+                break
+        return self.status
+
+    def _resume(self) -> bool:
+        """Carry on after waiting for input, if there is input now. False while there still is none."""
+        if self.halted:
+            modes = self._pending_input
+            if modes is not None:
+                if not self._inputs:
+                    return False
+                self._pending_input = None
+                self.write(self.next_pointer(mode=modes[0]), self._inputs.popleft())
+                self.inputs_consumed += 1
+                self.instructions += 1
+            self.halted = False
+        return True
+
+    def _execute(self, max_steps: Optional[int] = None):
+        if self.tracer is None and self.profiler is None:
+            self._run_fast(max_steps=max_steps)
+            return
+        steps = 0
+        while not (self.finished or self.halted) and steps != max_steps:
+            self.process_step()
+            steps += 1
+
+    def stream(self, inputs: Union[Iterable[int], Callable[[], int]] = ()) -> Iterator[int]:
+        """
+        Yield every output as soon as it is produced. Input is only taken from inputs (an iterable, or a
+        callable that raises StopIteration when it has nothing left) when the program asks for it.
+        Stops when the program finishes, or halts for input once inputs is exhausted.
+        """
+        next_input = inputs if callable(inputs) else iter(inputs).__next__
+        self._resume()
+        while not self.finished:
+            if self.tracer is not None or self.profiler is not None:
+                while not (self.finished or self.halted or self.output_values):
+                    self.process_step()
+            else:
+                self._run_fast(until_output=True)
+
+            if self.output_values:
+                outputs, self.output_values = self.output_values, []
+                yield from outputs
+            if self.halted:
+                try:
+                    self._inputs.append(next_input())
+                except StopIteration:
+                    return
+                self._resume()
+
+    def iter_outputs(self) -> Iterator[int]:
+        """Yield outputs as they are produced, using the inputs that were already queued."""
+        return self.stream()
+
+    def _run_fast(self, until_output: bool = False, max_steps: Optional[int] = None):
+        # process_step without the tracer and profiler checks, inlined, for at most max_steps steps
+        decoded = self._decoded
+        steps = 0
+        try:
+            if until_output:
+                for steps in count() if max_steps is None else range(max_steps):
+                    if self.finished or self.halted or self.output_values:
+                        break
+                    index = self.index
+                    entry = decoded.get(index)
+                    if entry is None:
+                        entry = self._decode(index)
+                    self.index = index + 1
+                    entry[0](self, entry[1])
+                else:
+                    steps = max_steps
+                return
+
+            for steps in count() if max_steps is None else range(max_steps):
+                if self.finished or self.halted:
+                    break
+                index = self.index
+                entry = decoded.get(index)
+                if entry is None:
+                    entry = self._decode(index)
+                self.index = index + 1
+                entry[0](self, entry[1])
+            else:
+                steps = max_steps
+        finally:
+            self.steps += steps
+            self.instructions += steps
+
     def __repr__(self):
-        return f"<IntcodeComputer: index {self.index}, output value {self.output_values}"
+        return f"<IntcodeComputer: index {self.index}, output value {list(self.output_values)}"
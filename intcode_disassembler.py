@@ -0,0 +1,341 @@
+"""
+Static analysis of Intcode programs: disassembly, basic blocks, control-flow graph and written addresses.
+
+    python intcode_disassembler.py day9input
+"""
+import sys
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from intcode_computer import OPCODE_NAMES, PARAMETER_COUNTS, WRITES, decode
+
+# What every word of the program is, see ProgramAnalysis.code
+DATA, OPCODE, PARAMETER = 0, 1, 2
+
+
+class DecodedInstruction(NamedTuple):
+    address: int
+    opcode: int
+    modes: Tuple[int, ...]
+    parameters: Tuple[int, ...]
+
+    @property
+    def length(self) -> int:
+        return 1 + len(self.parameters)
+
+    def __str__(self):
+        operands = []
+        for mode, parameter in zip(self.modes, self.parameters):
+            if mode == 0:
+                operands.append(f'[{parameter}]')
+            elif mode == 1:
+                operands.append(f'#{parameter}')
+            else:
+                operands.append(f'[rb{parameter:+d}]')
+        return f'{OPCODE_NAMES[self.opcode]} {", ".join(operands)}'.rstrip()
+
+
+class BasicBlock(NamedTuple):
+    start: int
+    instructions: List[DecodedInstruction]
+    # Blocks control continues in directly: jump targets and the fall-through
+    successors: Tuple[int, ...]
+    # The block ends with a jump to an address read from memory, which may be any of the code pointers
+    indirect: bool
+
+    @property
+    def end(self) -> int:
+        last = self.instructions[-1]
+        return last.address + last.length
+
+
+def control_flow(instruction: DecodedInstruction) -> Tuple[Optional[int], bool, bool]:
+    """The direct jump target of an instruction, whether it can fall through, and whether it jumps indirectly."""
+    opcode = instruction.opcode
+    if opcode == 99:
+        return None, False, False
+    if opcode not in (5, 6):
+        return None, True, False
+    condition_mode, target_mode = instruction.modes
+    condition, target = instruction.parameters
+    taken = None if condition_mode != 1 else bool(condition) == (opcode == 5)
+    if taken is False:
+        return None, True, False
+    if target_mode != 1:
+        return None, taken is None, True
+    return target, taken is None, False
+
+
+class ProgramAnalysis:
+    """
+    Static analysis of an Intcode program, given as the list passed to IntcodeComputer(initial_memory).
+
+    Code is found by following the control flow from address 0. Jumps to an immediate target are
+    followed. A jump to an address read from memory is indirect; if there are any, the constants the
+    program stores unchanged with an add or multiply (return addresses pushed before a call) are
+    decoded as well, as possible targets. The relative base is propagated as a constant where it is
+    one, so relative mode writes resolve to addresses too.
+
+    code_is_constant is True only when it is proven that no write lands on an instruction: all code
+    is reached through direct jumps, every write goes to a known address, and none of those addresses
+    is part of an instruction. Every word is decoded at most once and the relative base of a block
+    changes at most twice, so the analysis takes linear time.
+    """
+
+    def __init__(self, program: Sequence[int]):
+        self.program = list(program)
+        # DATA, OPCODE or PARAMETER for every word of the program
+        self.code = bytearray(len(self.program))
+        self.instructions: Dict[int, DecodedInstruction] = {}
+        self.blocks: Dict[int, BasicBlock] = {}
+        # Addresses the program may write to, as far as they are known statically
+        self.writes: Set[int] = set()
+        # Instructions that write to an address that is not known statically
+        self.unknown_writes: List[int] = []
+        self.indirect_jumps: List[int] = []
+        # Reachable addresses that do not hold a valid instruction, or jumps out of the program
+        self.invalid: List[int] = []
+        # Possible targets of the indirect jumps
+        self.code_pointers: Set[int] = set()
+        # Relative base at the start of every block, None where it is not a constant
+        self.relative_bases: Dict[int, Optional[int]] = {}
+
+        leaders = self._discover()
+        self._build_blocks(leaders)
+        self._propagate_relative_base()
+        self._collect_writes()
+
+    @property
+    def code_is_constant(self) -> bool:
+        if self.indirect_jumps or self.unknown_writes or self.invalid:
+            return False
+        code = self.code
+        return not any(address < len(code) and code[address] for address in self.writes)
+
+    def _decode(self, address: int) -> Optional[DecodedInstruction]:
+        program = self.program
+        word = program[address]
+        if word < 0 or word % 100 not in PARAMETER_COUNTS:
+            return None
+        opcode, modes = decode(word)
+        count = PARAMETER_COUNTS[opcode]
+        modes = modes[:count]
+        if address + count >= len(program) or any(mode > 2 for mode in modes):
+            return None
+        if opcode in WRITES and modes[-1] == 1:
+            return None
+        return DecodedInstruction(address, opcode, modes, tuple(program[address + 1:address + 1 + count]))
+
+    def _discover(self) -> Set[int]:
+        n = len(self.program)
+        code = self.code
+        leaders = {0}
+        pending = [0]
+        followed_pointers: Set[int] = set()
+        while pending:
+            while pending:
+                ip = pending.pop()
+                while code[ip] != OPCODE:
+                    instruction = self._decode(ip) if code[ip] == DATA else None
+                    if instruction is None or any(code[ip + 1:ip + instruction.length]):
+                        # Not an instruction, or a jump into the middle of one
+                        self.invalid.append(ip)
+                        break
+                    self.instructions[ip] = instruction
+                    code[ip] = OPCODE
+                    code[ip + 1:ip + instruction.length] = bytes([PARAMETER]) * (instruction.length - 1)
+                    self._collect_code_pointer(instruction)
+
+                    target, falls_through, indirect = control_flow(instruction)
+                    if indirect:
+                        self.indirect_jumps.append(ip)
+                    if target is not None:
+                        if 0 <= target < n:
+                            leaders.add(target)
+                            pending.append(target)
+                        else:
+                            # Whatever is written there at run time would be executed
+                            self.invalid.append(ip)
+                    ip += instruction.length
+                    if not falls_through:
+                        break
+                    if ip >= n:
+                        self.invalid.append(ip)
+                        break
+                    if instruction.opcode in (5, 6):
+                        leaders.add(ip)
+
+            if self.indirect_jumps:
+                new_pointers = self.code_pointers - followed_pointers
+                followed_pointers |= new_pointers
+                leaders |= new_pointers
+                pending = sorted(new_pointers)
+        return leaders
+
+    def _collect_code_pointer(self, instruction: DecodedInstruction):
+        if instruction.opcode not in (1, 2) or instruction.modes[:2] != (1, 1):
+            return
+        a, b = instruction.parameters[:2]
+        neutral = 0 if instruction.opcode == 1 else 1
+        for value, other in ((a, b), (b, a)):
+            if other == neutral and 0 <= value < len(self.program):
+                self.code_pointers.add(value)
+
+    def _build_blocks(self, leaders: Set[int]):
+        code = self.code
+        block: List[DecodedInstruction] = []
+        for ip in range(len(self.program)):
+            if code[ip] != OPCODE:
+                continue
+            if block and (ip in leaders or block[-1].address + block[-1].length != ip):
+                self._add_block(block)
+                block = []
+            instruction = self.instructions[ip]
+            block.append(instruction)
+            if instruction.opcode in (5, 6, 99):
+                self._add_block(block)
+                block = []
+        if block:
+            self._add_block(block)
+        # Indirect jumps can only reach pointers that hold code
+        self.code_pointers = {pointer for pointer in self.code_pointers if pointer in self.blocks}
+
+    def _add_block(self, block: List[DecodedInstruction]):
+        last = block[-1]
+        target, falls_through, indirect = control_flow(last)
+        successors = []
+        if target is not None and 0 <= target < len(self.code) and self.code[target] == OPCODE:
+            successors.append(target)
+        end = last.address + last.length
+        if falls_through and end < len(self.code) and self.code[end] == OPCODE:
+            successors.append(end)
+        self.blocks[block[0].address] = BasicBlock(block[0].address, block, tuple(dict.fromkeys(successors)),
+                                                   indirect)
+
+    def _propagate_relative_base(self):
+        relative_bases = self.relative_bases
+        # All indirect jumps meet in one node before they continue at the code pointers
+        indirect_base = []
+
+        def join(start: int, relative_base: Optional[int]):
+            if start not in relative_bases:
+                relative_bases[start] = relative_base
+            elif relative_bases[start] is not None and relative_bases[start] != relative_base:
+                relative_bases[start] = None
+            else:
+                return
+            pending.append(start)
+
+        pending = []
+        if 0 in self.blocks:
+            join(0, 0)
+        while pending:
+            block = self.blocks[pending.pop()]
+            relative_base = self._relative_base_after(block, relative_bases[block.start])
+            for successor in block.successors:
+                join(successor, relative_base)
+            if block.indirect:
+                if not indirect_base:
+                    indirect_base.append(relative_base)
+                elif indirect_base[0] is not None and indirect_base[0] != relative_base:
+                    indirect_base[0] = None
+                else:
+                    continue
+                for pointer in self.code_pointers:
+                    join(pointer, indirect_base[0])
+
+    @staticmethod
+    def _relative_base_after(block: BasicBlock, relative_base: Optional[int]) -> Optional[int]:
+        for instruction in block.instructions:
+            if instruction.opcode == 9 and relative_base is not None:
+                relative_base = relative_base + instruction.parameters[0] if instruction.modes[0] == 1 else None
+        return relative_base
+
+    def _collect_writes(self):
+        for block in self.blocks.values():
+            relative_base = self.relative_bases.get(block.start)
+            for instruction in block.instructions:
+                if instruction.opcode in WRITES:
+                    mode, parameter = instruction.modes[-1], instruction.parameters[-1]
+                    if mode == 0:
+                        self.writes.add(parameter)
+                    elif relative_base is not None:
+                        self.writes.add(relative_base + parameter)
+                    else:
+                        self.unknown_writes.append(instruction.address)
+                elif instruction.opcode == 9 and relative_base is not None:
+                    relative_base = relative_base + instruction.parameters[0] if instruction.modes[0] == 1 else None
+
+    def loops(self) -> List[Tuple[int, int]]:
+        """(block, loop header) for every back edge of the direct control flow, found by depth-first search."""
+        back_edges = []
+        # 1 while a block is on the search path, 2 once all its successors are done
+        state: Dict[int, int] = {}
+        for root in self.blocks:
+            if root in state:
+                continue
+            state[root] = 1
+            stack = [(root, iter(self.blocks[root].successors))]
+            while stack:
+                start, successors = stack[-1]
+                for successor in successors:
+                    if state.get(successor) == 1:
+                        back_edges.append((start, successor))
+                    elif successor not in state:
+                        state[successor] = 1
+                        stack.append((successor, iter(self.blocks[successor].successors)))
+                        break
+                else:
+                    state[start] = 2
+                    stack.pop()
+        return sorted(back_edges)
+
+    def listing(self) -> str:
+        lines = []
+        program = self.program
+        ip = 0
+        while ip < len(program):
+            if self.code[ip] != OPCODE:
+                lines.append(f'{ip:8}: {program[ip]:<40} data')
+                ip += 1
+                continue
+            block = self.blocks.get(ip)
+            if block is not None:
+                header = f'block {ip}'
+                if self.relative_bases.get(ip) is not None:
+                    header += f', rb = {self.relative_bases[ip]}'
+                if block.successors or block.indirect:
+                    header += ', continues at ' + ', '.join(
+                        [str(successor) for successor in block.successors] + ['indirect'] * block.indirect)
+                lines.append('')
+                lines.append(f'; {header}')
+            instruction = self.instructions[ip]
+            words = ' '.join(map(str, program[ip:ip + instruction.length]))
+            lines.append(f'{ip:8}: {words:<40} {instruction}')
+            ip += instruction.length
+        return '\n'.join(lines)
+
+    def summary(self) -> str:
+        return '\n'.join([
+            f'{len(self.instructions)} instructions in {len(self.blocks)} blocks, '
+            f'{len(self.program) - len(self.instructions)} words of parameters and data',
+            f'writes to {len(self.writes)} known addresses, {len(self.unknown_writes)} writes to unknown addresses',
+            f'{len(self.indirect_jumps)} indirect jumps, {len(self.code_pointers)} code pointers',
+            f'loops (block -> header): {", ".join(f"{a} -> {b}" for a, b in self.loops()) or "none"}',
+            f'code is {"provably" if self.code_is_constant else "not provably"} constant',
+        ])
+
+
+def analyze(program: Sequence[int]) -> ProgramAnalysis:
+    return ProgramAnalysis(program)
+
+
+def disassemble(program: Sequence[int]) -> str:
+    return ProgramAnalysis(program).listing()
+
+
+if __name__ == '__main__':
+    with open(sys.argv[1], 'r') as f:
+        analysis = analyze([int(x) for x in f.read().split(',')])
+    print(analysis.listing())
+    print()
+    print(analysis.summary())
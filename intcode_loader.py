@@ -0,0 +1,114 @@
+"""
+Loading Intcode programs, from comma-separated text or from a compact binary image.
+
+The image is a header (magic, number of words, number of escapes) followed by every word as a
+little-endian int64, then the escapes: words that do not fit in an int64 hold ESCAPE in the word
+array and their real value in the escape table (index, byte length, signed little-endian bytes).
+An image without escapes is loaded as a memoryview of a memory-mapped file, which ComputerMemory
+uses as it is until the program first writes to it.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterable, Iterator, List, Sequence, TextIO, Union
+
+MAGIC = b'ICIMAGE1'
+HEADER = struct.Struct('<8sQQ')
+ESCAPE_ENTRY = struct.Struct('<QI')
+WORD = struct.Struct('<q')
+ESCAPE = -(1 << 63)
+CHUNK_SIZE = 1 << 16
+
+
+def iter_words(file: Union[str, TextIO], chunk_size: int = CHUNK_SIZE) -> Iterator[int]:
+    """Parse comma-separated words from a text file, a chunk at a time."""
+    if isinstance(file, str):
+        with open(file, 'r') as f:
+            yield from iter_words(f, chunk_size)
+        return
+
+    partial = ''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        words = (partial + chunk).split(',')
+        # The last word may continue in the next chunk
+        partial = words.pop()
+        for word in words:
+            yield int(word)
+    if partial.strip():
+        yield int(partial)
+
+
+def load_text(file: Union[str, TextIO], chunk_size: int = CHUNK_SIZE) -> List[int]:
+    return list(iter_words(file, chunk_size))
+
+
+def save_image(file: Union[str, BinaryIO], program: Iterable[int]):
+    """Write a program as a binary image."""
+    if isinstance(file, str):
+        with open(file, 'wb') as f:
+            save_image(f, program)
+        return
+
+    words = array('q')
+    escapes = []
+    for index, word in enumerate(program):
+        if ESCAPE < word < 1 << 63:
+            words.append(word)
+        else:
+            words.append(ESCAPE)
+            escapes.append((index, word))
+    if sys.byteorder != 'little':
+        words.byteswap()
+    file.write(HEADER.pack(MAGIC, len(words), len(escapes)))
+    file.write(words.tobytes())
+    for index, word in escapes:
+        value = word.to_bytes((word.bit_length() + 8) // 8, 'little', signed=True)
+        file.write(ESCAPE_ENTRY.pack(index, len(value)))
+        file.write(value)
+
+
+def load_image(file: str) -> Sequence[int]:
+    """
+    Load a binary image. Without escapes (and on a little-endian machine) the words are a read-only
+    memoryview of the memory-mapped file, otherwise a list.
+    """
+    with open(file, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, count, escape_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f'{file} is not an Intcode image')
+    end = HEADER.size + count * WORD.size
+    if len(data) < end:
+        raise ValueError(f'{file} is truncated: expected {count} words')
+    words = memoryview(data)[HEADER.size:end]
+    if sys.byteorder == 'little':
+        words = words.cast('q')
+    else:
+        words = [word for word, in WORD.iter_unpack(words)]
+    if not escape_count:
+        return words
+
+    program = list(words)
+    offset = end
+    for _ in range(escape_count):
+        index, length = ESCAPE_ENTRY.unpack_from(data, offset)
+        offset += ESCAPE_ENTRY.size
+        program[index] = int.from_bytes(data[offset:offset + length], 'little', signed=True)
+        offset += length
+    return program
+
+
+def load_program(file: str) -> Sequence[int]:
+    """Load a program from a binary image or from comma-separated text, whichever the file holds."""
+    with open(file, 'rb') as f:
+        is_image = f.read(len(MAGIC)) == MAGIC
+    return load_image(file) if is_image else load_text(file)
+
+
+if __name__ == '__main__':
+    # python intcode_loader.py day9input day9.img
+    save_image(sys.argv[2], iter_words(sys.argv[1]))
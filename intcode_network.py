@@ -0,0 +1,155 @@
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+from intcode_computer import IntcodeComputer
+
+Router = Callable[[int], Union[str, Iterable[str]]]
+
+RUNNING, WAITING, BLOCKED, FINISHED = 'running', 'waiting', 'blocked', 'finished'
+
+
+class IntcodeNetwork:
+    """
+    Runs a graph of IntcodeComputers as asyncio tasks. Every computer reads from its own input
+    channel (a bounded asyncio.Queue) and its outputs are put on the channels of the computers it is
+    connected to, or handed to a router that picks the destination per value. A computer that needs
+    input awaits its channel, so idle computers cost nothing. Computers run slices of at most
+    slice_steps steps and yield to the others in between, so one that computes for a long time
+    without reading input does not hold up the network, and it emits its outputs slice by slice.
+
+    run() returns once every computer finished or waits for input that can no longer arrive.
+    """
+
+    def __init__(self, channel_size: int = 64, slice_steps: int = 1000):
+        self.channel_size = channel_size
+        self.slice_steps = slice_steps
+        self.computers: Dict[str, IntcodeComputer] = {}
+        self.channels: Dict[str, asyncio.Queue] = {}
+        self.destinations: Dict[str, List[str]] = {}
+        self.routers: Dict[str, Router] = {}
+        # Outputs of computers that are not connected to anything
+        self.outputs: Dict[str, List[int]] = {}
+        self.last_output: Dict[str, int] = {}
+        self._states: Dict[str, str] = {}
+        # name -> channel a blocked computer waits to put a value on
+        self._blocked_on: Dict[str, asyncio.Queue] = {}
+        self._quiescent: Optional[asyncio.Event] = None
+
+    def add(self, name: str, computer: IntcodeComputer) -> IntcodeComputer:
+        if name in self.computers:
+            raise ValueError(f'Computer {name} is already in the network.')
+        self.computers[name] = computer
+        self.channels[name] = asyncio.Queue(self.channel_size)
+        self.destinations[name] = []
+        self.outputs[name] = []
+        return computer
+
+    def connect(self, source: str, destination: str):
+        """Put every output of source on the input channel of destination (in addition to earlier connections)."""
+        self.destinations[source].append(destination)
+
+    def route(self, source: str, router: Router):
+        """Let router pick the destination(s) of every output of source."""
+        self.routers[source] = router
+
+    def send(self, name: str, value: int):
+        """Queue an input value for a computer, e.g. before the network runs."""
+        self.channels[name].put_nowait(value)
+
+    @classmethod
+    def amplifiers(cls, program: Sequence[int], phase_setting: Sequence[int], signal: int = 0,
+                   feedback: bool = False, engine=IntcodeComputer, channel_size: int = 64,
+                   slice_steps: int = 1000) -> 'IntcodeNetwork':
+        """A chain (or with feedback a ring) of amplifiers as in day 7, the first one receives signal."""
+        network = cls(channel_size, slice_steps)
+        names = [f'amplifier {i}' for i in range(len(phase_setting))]
+        for name, phase in zip(names, phase_setting):
+            network.add(name, engine(program))
+            network.send(name, phase)
+        for source, destination in zip(names, names[1:]):
+            network.connect(source, destination)
+        if feedback:
+            network.connect(names[-1], names[0])
+        network.send(names[0], signal)
+        return network
+
+    async def run(self) -> Dict[str, int]:
+        self._quiescent = asyncio.Event()
+        self._states = {name: RUNNING for name in self.computers}
+        tasks = [asyncio.create_task(self._run_computer(name)) for name in self.computers]
+        quiescent = asyncio.create_task(self._quiescent.wait())
+        pending = {quiescent, *tasks}
+        try:
+            while quiescent in pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if any(task is not quiescent and task.exception() is not None for task in done):
+                    break
+        finally:
+            for task in [quiescent, *tasks]:
+                task.cancel()
+            await asyncio.gather(quiescent, *tasks, return_exceptions=True)
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        if BLOCKED in self._states.values():
+            raise RuntimeError('Deadlock: computers are blocked on full channels')
+        return self.last_output
+
+    def _set_state(self, name: str, state: str):
+        self._states[name] = state
+        if state == RUNNING:
+            return
+        # Nothing can change any more once no computer runs, every waiting computer has no input and
+        # every blocked computer waits for a channel that is still full
+        if all(s == FINISHED or s == BLOCKED and self._blocked_on[n].full() or s == WAITING and self.channels[n].empty()
+               for n, s in self._states.items()):
+            self._quiescent.set()
+
+    async def _run_computer(self, name: str):
+        computer = self.computers[name]
+        channel = self.channels[name]
+        while True:
+            status = computer.run_slice(max_steps=self.slice_steps)
+            outputs, computer.output_values = computer.output_values, []
+            for value in outputs:
+                await self._emit(name, value)
+            if status == computer.FINISHED:
+                self._set_state(name, FINISHED)
+                # Unblock computers that still try to send to this one
+                while not channel.empty():
+                    channel.get_nowait()
+                return
+            if status == computer.PAUSED:
+                # Let the other computers run
+                await asyncio.sleep(0)
+                continue
+
+            if channel.empty():
+                self._set_state(name, WAITING)
+            computer.feed(await channel.get())
+            while not channel.empty():
+                computer.feed(channel.get_nowait())
+            self._set_state(name, RUNNING)
+
+    async def _emit(self, name: str, value: int):
+        self.last_output[name] = value
+        if name in self.routers:
+            destinations = self.routers[name](value)
+            if isinstance(destinations, str):
+                destinations = [destinations]
+        else:
+            destinations = self.destinations[name]
+            if not destinations:
+                self.outputs[name].append(value)
+
+        for destination in destinations:
+            if self._states.get(destination) == FINISHED:
+                continue
+            channel = self.channels[destination]
+            if channel.full():
+                self._blocked_on[name] = channel
+                self._set_state(name, BLOCKED)
+                await channel.put(value)
+                self._set_state(name, RUNNING)
+            else:
+                channel.put_nowait(value)
@@ -0,0 +1,114 @@
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, TextIO, Tuple, Union
+
+from intcode_computer import OPCODE_NAMES, PARAMETER_COUNTS
+
+
+class Profiler:
+    """
+    Counts executions and time (in nanoseconds) per opcode, per opcode and parameter mode combination,
+    per instruction address and per basic block, and the highest address any instruction touched.
+
+    Attach it with IntcodeComputer(program, profiler=Profiler()). Like a tracer it makes run() take
+    the step-by-step loop, without a profiler the fast loop is not affected at all. A block starts at
+    the first instruction that is executed after a jump, or wherever the computer resumes.
+    """
+
+    def __init__(self, top_blocks: int = 10, clock: Callable[[], int] = time.perf_counter_ns):
+        self.top_blocks = top_blocks
+        self.clock = clock
+        self.steps = 0
+        self.total_time = 0
+        self.opcode_counts: Counter = Counter()
+        self.opcode_times: Counter = Counter()
+        self.mode_counts: Counter = Counter()
+        self.mode_times: Counter = Counter()
+        self.address_counts: Counter = Counter()
+        self.address_times: Counter = Counter()
+        # block start -> number of times the block was entered
+        self.block_entries: Counter = Counter()
+        self.block_times: Counter = Counter()
+        # (block start, instruction address) -> count and time, for the collapsed stacks
+        self.stack_counts: Counter = Counter()
+        self.stack_times: Counter = Counter()
+        # address -> opcode last executed there
+        self.address_opcodes: Dict[int, int] = {}
+        self.max_address = -1
+        self._block = None
+        self._next_index = None
+
+    def profile(self, computer, index: int, handler, modes: Tuple[int, int, int]):
+        """Execute one decoded instruction of computer and record it."""
+        opcode = computer.memory[index] % 100
+        parameter_count = PARAMETER_COUNTS[opcode]
+        if index != self._next_index:
+            self._block = index
+            self.block_entries[index] += 1
+
+        highest = index + parameter_count
+        for k in range(parameter_count):
+            if modes[k] == 0:
+                highest = max(highest, computer.memory[index + 1 + k])
+            elif modes[k] == 2:
+                highest = max(highest, computer.relative_base + computer.memory[index + 1 + k])
+        if highest > self.max_address:
+            self.max_address = highest
+
+        start = self.clock()
+        handler(computer, modes)
+        elapsed = self.clock() - start
+
+        mode_key = (opcode, modes[:parameter_count])
+        self.steps += 1
+        self.total_time += elapsed
+        self.opcode_counts[opcode] += 1
+        self.opcode_times[opcode] += elapsed
+        self.mode_counts[mode_key] += 1
+        self.mode_times[mode_key] += elapsed
+        self.address_counts[index] += 1
+        self.address_times[index] += elapsed
+        self.address_opcodes[index] = opcode
+        self.block_times[self._block] += elapsed
+        self.stack_counts[self._block, index] += 1
+        self.stack_times[self._block, index] += elapsed
+        # Jumps end a block whether they are taken or not
+        self._next_index = None if opcode in (5, 6) else index + 1 + parameter_count
+
+    def hottest_blocks(self, n: Optional[int] = None) -> List[Tuple[int, int, int]]:
+        """(start, entries, time) of the n blocks that took the most time."""
+        return [(start, self.block_entries[start], block_time)
+                for start, block_time in self.block_times.most_common(n or self.top_blocks)]
+
+    def report(self, top: int = 10) -> str:
+        lines = [f'{self.steps} steps in {self.total_time / 1e6:.3f} ms, highest address touched {self.max_address}']
+
+        def table(title: str, counts: Counter, times: Counter, label: Callable, n: Optional[int] = None):
+            lines.append('')
+            lines.append(f'{title:24} {"count":>12} {"time ms":>10} {"time %":>7}')
+            for key, key_time in times.most_common(n):
+                share = key_time / self.total_time if self.total_time else 0
+                lines.append(f'{label(key):24} {counts[key]:12} {key_time / 1e6:10.3f} {share:7.1%}')
+
+        table('opcode', self.opcode_counts, self.opcode_times, lambda opcode: OPCODE_NAMES[opcode])
+        table('opcode modes', self.mode_counts, self.mode_times,
+              lambda key: f'{OPCODE_NAMES[key[0]]} {"".join(map(str, key[1]))}')
+        table('address', self.address_counts, self.address_times,
+              lambda address: f'{address} {OPCODE_NAMES[self.address_opcodes[address]]}', top)
+        table('block', self.block_entries, self.block_times, lambda start: f'block {start}', self.top_blocks)
+        return '\n'.join(lines)
+
+    def write_collapsed(self, file: Union[str, TextIO], weight: str = 'time'):
+        """
+        Write the profile as collapsed stacks (one 'intcode;block;instruction value' line per
+        instruction), the input format of flamegraph.pl and speedscope. weight is 'time' or 'count'.
+        """
+        if isinstance(file, str):
+            with open(file, 'w') as f:
+                self.write_collapsed(f, weight)
+            return
+        if weight not in ('time', 'count'):
+            raise ValueError(f'Unknown weight {weight}')
+        values = self.stack_times if weight == 'time' else self.stack_counts
+        for (block, index), value in sorted(values.items()):
+            file.write(f'intcode;block {block};{index} {OPCODE_NAMES[self.address_opcodes[index]]} {value}\n')
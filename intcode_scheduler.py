@@ -0,0 +1,94 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, List, Optional, Tuple
+
+from intcode_computer import IntcodeComputer
+
+
+class Scheduler:
+    """
+    Runs many IntcodeComputers on a thread pool, one time slice at a time. Computers take turns in
+    the order they were added: a computer that can still run goes to the back of the queue after
+    every slice of at most slice_steps steps (and slice_time seconds), so a program that never stops
+    cannot hold up the others. A computer added with max_steps is left paused once it used them up.
+
+    The threads share the GIL, so this bounds how long any computer waits for its next slice rather
+    than running the computers faster than one after the other would.
+
+    run() returns once every computer finished, waits for input or used up its steps, with the
+    status of each. Outputs are collected per computer in outputs as the slices end.
+    """
+
+    def __init__(self, workers: Optional[int] = None, slice_steps: int = 10000, slice_time: Optional[float] = None):
+        if slice_steps <= 0:
+            raise ValueError(f'Slices need at least one step, not {slice_steps}')
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.slice_steps = slice_steps
+        self.slice_time = slice_time
+        self.computers: Dict[str, IntcodeComputer] = {}
+        self.outputs: Dict[str, List[int]] = {}
+        # Slices every computer got
+        self.slices: Dict[str, int] = {}
+        # name -> (steps of the computer when it was added, steps it may take from then on)
+        self._budgets: Dict[str, Tuple[int, int]] = {}
+
+    def add(self, name: str, computer: IntcodeComputer, *inputs: int, max_steps: Optional[int] = None
+            ) -> IntcodeComputer:
+        if name in self.computers:
+            raise ValueError(f'Computer {name} is already scheduled.')
+        computer.feed(*inputs)
+        self.computers[name] = computer
+        self.outputs[name] = []
+        self.slices[name] = 0
+        if max_steps is not None:
+            self._budgets[name] = (computer.steps, max_steps)
+        return computer
+
+    def feed(self, name: str, *values: int):
+        """Queue input values for a computer, e.g. one that is waiting after run()."""
+        self.computers[name].feed(*values)
+
+    def remaining_steps(self, name: str) -> Optional[int]:
+        if name not in self._budgets:
+            return None
+        start, max_steps = self._budgets[name]
+        return max(0, max_steps - (self.computers[name].steps - start))
+
+    def _runnable(self, name: str) -> bool:
+        computer = self.computers[name]
+        if computer.finished or computer.halted and not computer.input_values:
+            return False
+        return self.remaining_steps(name) != 0
+
+    def _run_slice(self, name: str) -> str:
+        computer = self.computers[name]
+        max_steps = self.slice_steps
+        remaining = self.remaining_steps(name)
+        if remaining is not None:
+            max_steps = min(max_steps, remaining)
+        deadline = None if self.slice_time is None else time.monotonic() + self.slice_time
+        return computer.run_slice(max_steps, deadline)
+
+    def run(self) -> Dict[str, str]:
+        queue: Deque[str] = deque(name for name in self.computers if self._runnable(name))
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            running: Dict[Future, str] = {}
+            while queue or running:
+                # Only as many slices as workers are handed out, so the queue keeps the order of turns
+                while queue and len(running) < max(1, self.workers):
+                    name = queue.popleft()
+                    running[executor.submit(self._run_slice, name)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    status = future.result()
+                    self.slices[name] += 1
+                    computer = self.computers[name]
+                    if computer.output_values:
+                        self.outputs[name].extend(computer.output_values)
+                        computer.output_values = []
+                    if status == IntcodeComputer.PAUSED and self._runnable(name):
+                        queue.append(name)
+        return {name: computer.status for name, computer in self.computers.items()}
@@ -0,0 +1,93 @@
+import logging
+import struct
+from typing import BinaryIO, Iterator, NamedTuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class TraceEvent(NamedTuple):
+    step: int
+    index: int
+    instruction: int
+    relative_base: int
+
+
+class Tracer:
+    """Receives one event per executed instruction, before the instruction runs."""
+
+    def on_step(self, computer, index: int, instruction: int):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class LoggingTracer(Tracer):
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+        self.step = 0
+
+    def on_step(self, computer, index: int, instruction: int):
+        logger.log(self.level, 'step %d: mem[%d] = %d, relative base %d',
+                   self.step, index, instruction, computer.relative_base)
+        self.step += 1
+
+
+class FileTracer(Tracer):
+    """
+    Writes a compact binary trace: a magic header followed by one fixed-width record per step
+    (instruction address, instruction word, relative base). Read it back with read_trace().
+    """
+    MAGIC = b'ICTRACE1'
+    RECORD = struct.Struct('<IIq')
+    BUFFERED_RECORDS = 4096
+
+    def __init__(self, file: Union[str, BinaryIO]):
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, 'wb') if self._owns_file else file
+        self.file.write(self.MAGIC)
+        self._buffer = bytearray()
+        self.steps = 0
+
+    def on_step(self, computer, index: int, instruction: int):
+        self._buffer += self.RECORD.pack(index, instruction, computer.relative_base)
+        self.steps += 1
+        if self.steps % self.BUFFERED_RECORDS == 0:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self._buffer)
+        self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        if self._owns_file:
+            self.file.close()
+
+
+def read_trace(file: Union[str, BinaryIO]) -> Iterator[TraceEvent]:
+    """Replay a trace written by FileTracer."""
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            yield from read_trace(f)
+        return
+
+    if file.read(len(FileTracer.MAGIC)) != FileTracer.MAGIC:
+        raise ValueError('Not an Intcode trace file')
+    record_size = FileTracer.RECORD.size
+    step = 0
+    while True:
+        chunk = file.read(record_size * FileTracer.BUFFERED_RECORDS)
+        if not chunk:
+            break
+        if len(chunk) % record_size:
+            raise ValueError(f'Truncated trace record after step {step + len(chunk) // record_size}')
+        for index, instruction, relative_base in FileTracer.RECORD.iter_unpack(chunk):
+            yield TraceEvent(step, index, instruction, relative_base)
+            step += 1
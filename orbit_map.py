@@ -0,0 +1,542 @@
+import gzip
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+import numpy as np
+
+CHUNK_SIZE = 1 << 20
+# CompactOrbitMap.apply() rebuilds the index for batches of more than 1/REBUILD_FRACTION of the bodies
+REBUILD_FRACTION = 64
+
+
+class OrbitCycleError(ValueError):
+    def __init__(self, body: int):
+        super().__init__(f'Orbits form a cycle through {body}')
+        # A body on the cycle or orbiting it
+        self.body = body
+
+
+class OrbitIndex:
+    """
+    Depths and lowest common ancestors of a forest of orbits, given as the parent id of every body
+    (-1 for a body that orbits nothing, such as COM).
+
+    Ancestors are found by binary lifting: up[k][v] is the ancestor 2**k levels above v (or the
+    root), so an LCA query takes O(log n) steps. lcas() and distances() answer many queries at once
+    with array operations.
+
+    The index can be updated in place: add_bodies() appends bodies and reparent() moves a subtree,
+    in time proportional to the size of the subtree. The arrays have spare capacity for new bodies;
+    the parents, depths, roots and up properties are views of the part in use.
+    """
+
+    def __init__(self, parents: Sequence[int]):
+        parents = np.array(parents, dtype=np.int64)
+        n = len(parents)
+        has_parent = parents >= 0
+
+        # Pointer doubling: after step k every body points 2**k levels up (roots point to themselves)
+        # and depths holds the distance to that ancestor. Every step is one pass over all bodies, so
+        # deep chains take O(log depth) passes instead of one per level.
+        ancestors = np.where(has_parent, parents, np.arange(n))
+        depths = has_parent.astype(np.int64)
+        up = [ancestors]
+        for _ in range(n.bit_length()):
+            next_ancestors = ancestors[ancestors]
+            if np.array_equal(next_ancestors, ancestors):
+                break
+            depths = depths + depths[ancestors]
+            ancestors = next_ancestors
+            up.append(ancestors)
+        cyclic = has_parent[ancestors]
+        if cyclic.any():
+            raise OrbitCycleError(int(np.flatnonzero(cyclic)[0]))
+        self.size = n
+        self.total = int(depths.sum())
+        self._parents = parents
+        self._depths = depths
+        # The root of the tree every body is in
+        self._roots = ancestors
+        # With L levels, lifts of up to 2**L - 1 levels are possible, at least the greatest depth
+        self._up = np.array(up)
+
+    @property
+    def parents(self) -> np.ndarray:
+        return self._parents[:self.size]
+
+    @property
+    def depths(self) -> np.ndarray:
+        return self._depths[:self.size]
+
+    @property
+    def roots(self) -> np.ndarray:
+        return self._roots[:self.size]
+
+    @property
+    def up(self) -> np.ndarray:
+        return self._up[:, :self.size]
+
+    def total_orbits(self) -> int:
+        """Direct and indirect orbits: the sum of all depths."""
+        return self.total
+
+    def add_bodies(self, count: int = 1):
+        """Add count bodies that orbit nothing, with the next ids."""
+        start = self.size
+        if start + count > len(self._parents):
+            self._reserve(max(start + count, 2 * len(self._parents)))
+        new = np.arange(start, start + count)
+        self._parents[new] = -1
+        self._depths[new] = 0
+        self._roots[new] = new
+        self._up[:, new] = new
+        self.size += count
+
+    def _reserve(self, capacity: int):
+        extra = capacity - len(self._parents)
+        self._parents = np.concatenate([self._parents, np.full(extra, -1, dtype=np.int64)])
+        self._depths = np.concatenate([self._depths, np.zeros(extra, dtype=np.int64)])
+        # Unused bodies are their own roots and ancestors, so that they never index out of range
+        unused = np.arange(len(self._roots), capacity)
+        self._roots = np.concatenate([self._roots, unused])
+        self._up = np.concatenate([self._up, np.broadcast_to(unused, (len(self._up), extra))], axis=1)
+
+    def reparent(self, body: int, parent: int, subtree: Sequence[int]):
+        """
+        Make body orbit parent (-1 for nothing). subtree holds body and all bodies that orbit it,
+        directly or indirectly, every body before the bodies that orbit it. Takes
+        O(len(subtree) * log n) time, raises OrbitCycleError if parent orbits body.
+        """
+        if parent >= 0 and self.lca(parent, body) == body:
+            raise OrbitCycleError(body)
+        subtree = np.asarray(subtree, dtype=np.int64)
+        depths = self._depths
+        delta = (depths[parent] + 1 if parent >= 0 else 0) - depths[body]
+        depths[subtree] += delta
+        self.total += int(delta) * len(subtree)
+        self._parents[body] = parent
+        self._roots[subtree] = self._roots[parent] if parent >= 0 else body
+
+        up = self._up
+        up[0][body] = parent if parent >= 0 else body
+        # Level k of a body comes from level k - 1 of itself and of an ancestor, which is either
+        # outside the subtree and unchanged, or inside it and already updated
+        for k in range(1, len(up)):
+            up[k][subtree] = up[k - 1][up[k - 1][subtree]]
+        deepest = int(depths[subtree].max())
+        while (1 << len(self._up)) - 1 < deepest:
+            top = self._up[-1]
+            self._up = np.concatenate([self._up, top[top][np.newaxis]])
+
+    def ancestor(self, v: int, levels: int) -> int:
+        k = 0
+        while levels:
+            if levels & 1:
+                v = int(self._up[k][v])
+            levels >>= 1
+            k += 1
+        return v
+
+    def lca(self, a: int, b: int) -> Optional[int]:
+        """The lowest common ancestor of a and b (which may be a or b itself), None if they are in different trees."""
+        if self._roots[a] != self._roots[b]:
+            return None
+        depths = self._depths
+        if depths[a] < depths[b]:
+            a, b = b, a
+        a = self.ancestor(a, int(depths[a] - depths[b]))
+        if a == b:
+            return a
+        for k in range(len(self._up) - 1, -1, -1):
+            up = self._up[k]
+            if up[a] != up[b]:
+                a, b = int(up[a]), int(up[b])
+        return int(self._up[0][a])
+
+    def distance(self, a: int, b: int) -> int:
+        """
+        The number of bodies that a or b orbits, but not both: the orbital transfers needed to get
+        from the body a orbits to the body b orbits.
+        """
+        lca = self.lca(a, b)
+        if lca is None:
+            raise ValueError(f'{a} and {b} are not in the same orbit map')
+        # Bodies both orbit: the LCA and its ancestors, or only its ancestors if it is a or b itself
+        common = self._depths[lca] + (lca != a and lca != b)
+        return int(self._depths[a] + self._depths[b] - 2 * common)
+
+    def lcas(self, a: Sequence[int], b: Sequence[int]) -> np.ndarray:
+        """lca() for every pair a[i], b[i], with -1 where they are in different trees."""
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        depths, up = self._depths, self._up
+        swap = depths[a] < depths[b]
+        a, b = np.where(swap, b, a), np.where(swap, a, b)
+        difference = depths[a] - depths[b]
+        for k in range(len(up)):
+            a = np.where(difference >> k & 1, up[k][a], a)
+        for k in range(len(up) - 1, -1, -1):
+            up_a, up_b = up[k][a], up[k][b]
+            move = up_a != up_b
+            a = np.where(move, up_a, a)
+            b = np.where(move, up_b, b)
+        lcas = np.where(a == b, a, up[0][a])
+        return np.where(self._roots[a] == self._roots[b], lcas, -1)
+
+    def distances(self, a: Sequence[int], b: Sequence[int]) -> np.ndarray:
+        """distance() for every pair a[i], b[i]."""
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        lcas = self.lcas(a, b)
+        if (lcas < 0).any():
+            raise ValueError('Not all pairs are in the same orbit map')
+        common = self._depths[lcas] + ((lcas != a) & (lcas != b))
+        return self._depths[a] + self._depths[b] - 2 * common
+
+
+class OrbitVertex:
+    """
+    A view of one body of a CompactOrbitMap, with the interface of day6.SpaceVertex. Views are made
+    when they are asked for and hold nothing but the map and the id of the body.
+    """
+    __slots__ = ('orbit_map', 'id')
+
+    def __init__(self, orbit_map: 'CompactOrbitMap', vertex_id: int):
+        self.orbit_map = orbit_map
+        self.id = vertex_id
+
+    @property
+    def name(self) -> str:
+        return self.orbit_map.names[self.id]
+
+    @property
+    def parent(self) -> Optional['OrbitVertex']:
+        parent = self.orbit_map.parents[self.id]
+        return None if parent < 0 else OrbitVertex(self.orbit_map, parent)
+
+    @property
+    def child_nodes(self) -> List['OrbitVertex']:
+        return [OrbitVertex(self.orbit_map, child) for child in self.orbit_map.children(self.id)]
+
+    def get_all_parents(self) -> List['OrbitVertex']:
+        return [OrbitVertex(self.orbit_map, parent) for parent in self.orbit_map.ancestors(self.id)]
+
+    def distance_to(self, other: 'OrbitVertex') -> int:
+        return self.orbit_map.index.distance(self.id, other.id)
+
+    def __eq__(self, other):
+        return isinstance(other, OrbitVertex) and self.orbit_map is other.orbit_map and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"{self.name} => {[child.name for child in self.child_nodes]}"
+
+
+class OrbitVertices(Mapping):
+    """Name -> OrbitVertex, made on lookup."""
+
+    def __init__(self, orbit_map: 'CompactOrbitMap'):
+        self.orbit_map = orbit_map
+
+    def __getitem__(self, name: str) -> OrbitVertex:
+        return OrbitVertex(self.orbit_map, self.orbit_map.ids[name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.orbit_map.names)
+
+    def __len__(self) -> int:
+        return len(self.orbit_map.names)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class CompactOrbitMap:
+    """
+    An orbit map with the query surface of day6.UniverseOrbitMap, stored in arrays instead of one
+    object per body: names are interned to ids in the order they are first seen, parents holds the
+    parent id of every body (-1 for none), and the children of body v are
+    child_ids[child_offsets[v]:child_offsets[v + 1]] (CSR layout). The children and the OrbitIndex
+    with the depths are built on first use.
+
+    Once built, they are kept up to date by add_edge(), remove_edge() and move_subtree(), in time
+    proportional to the size of the subtree that moves: the index is updated in place, and the
+    children lists that change are kept apart until child_offsets or child_ids are asked for.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.parents = array('q')
+        self._children: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # Children of bodies whose children changed since the CSR arrays were built
+        self._child_edits: Dict[int, List[int]] = {}
+        self._index: Optional[OrbitIndex] = None
+
+    def intern(self, name: str) -> int:
+        vertex_id = self.ids.get(name)
+        if vertex_id is None:
+            vertex_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.parents.append(-1)
+            if self._index is not None:
+                self._index.add_bodies()
+        return vertex_id
+
+    def add_edge(self, name_origin: str, name_dest: str):
+        """Add the orbit name_origin)name_dest. A body that already orbits another one has to be moved instead."""
+        origin = self.intern(name_origin)
+        dest = self.intern(name_dest)
+        parent = self.parents[dest]
+        if parent >= 0 and parent != origin:
+            raise ValueError(f'{name_dest} already orbits {self.names[parent]}, not {name_origin}')
+        self._set_parent(dest, origin)
+
+    def remove_edge(self, name_origin: str, name_dest: str):
+        """Remove the orbit name_origin)name_dest, leaving name_dest and its subtree orbiting nothing."""
+        dest = self.ids.get(name_dest)
+        if dest is None or name_origin not in self.ids or self.parents[dest] != self.ids[name_origin]:
+            raise ValueError(f'{name_dest} does not orbit {name_origin}')
+        self._set_parent(dest, -1)
+
+    def move_subtree(self, name: str, name_parent: str):
+        """Make name and everything that orbits it orbit name_parent instead."""
+        vertex_id = self.ids.get(name)
+        if vertex_id is None:
+            raise ValueError(f'{name} is not in the map')
+        self._set_parent(vertex_id, self.intern(name_parent))
+
+    def apply(self, edits: Iterable[Tuple[str, str, str]]):
+        """
+        Apply ('add', origin, dest), ('remove', origin, dest) and ('move', name, parent) edits in
+        order, all or none of them: if one fails, the earlier ones are undone (bodies they named stay).
+        A batch of more than a 1/REBUILD_FRACTION of the bodies drops the index and the children and
+        builds them again afterwards, which is cheaper than updating them edit by edit.
+        """
+        edits = list(edits)
+        operations = {'add': self.add_edge, 'remove': self.remove_edge, 'move': self.move_subtree}
+        for operation, _, _ in edits:
+            if operation not in operations:
+                raise ValueError(f'Unknown edit {operation}')
+
+        rebuild = self._index is not None and len(edits) * REBUILD_FRACTION > len(self.names)
+        if rebuild:
+            self._index = None
+            self._children = None
+            self._child_edits = {}
+        # (body, old parent) for every parent that changed
+        undo = []
+        try:
+            for operation, a, b in edits:
+                name = a if operation == 'move' else b
+                vertex_id = self.ids.get(name)
+                old_parent = -1 if vertex_id is None else self.parents[vertex_id]
+                operations[operation](a, b)
+                undo.append((self.ids[name], old_parent))
+            if rebuild:
+                self._build_children()
+                self.index
+        except Exception:
+            for vertex_id, parent in reversed(undo):
+                if rebuild:
+                    self.parents[vertex_id] = parent
+                else:
+                    self._set_parent(vertex_id, parent)
+            if rebuild:
+                self._index = None
+                self._children = None
+                self._child_edits = {}
+            raise
+
+    def _set_parent(self, vertex_id: int, parent: int):
+        old_parent = self.parents[vertex_id]
+        if parent == old_parent:
+            return
+        if parent >= 0 and self.orbits(parent, vertex_id):
+            raise ValueError(f'{self.names[vertex_id]} cannot orbit {self.names[parent]}, which orbits it')
+        if self._index is not None:
+            self._index.reparent(vertex_id, parent, self.subtree(vertex_id))
+        self.parents[vertex_id] = parent
+        if self._children is not None:
+            if old_parent >= 0:
+                self._edited_children(old_parent).remove(vertex_id)
+            if parent >= 0:
+                self._edited_children(parent).append(vertex_id)
+
+    def _edited_children(self, vertex_id: int) -> List[int]:
+        children = self._child_edits.get(vertex_id)
+        if children is None:
+            children = self._child_edits[vertex_id] = self.children(vertex_id)
+        return children
+
+    @classmethod
+    def from_file(cls, file: Union[str, TextIO], chunk_size: int = CHUNK_SIZE) -> 'CompactOrbitMap':
+        """
+        Load an orbit map file (plain or gzip-compressed) a chunk at a time, with the edges in any
+        order, and build the children and the index. Raises ValueError for malformed lines, bodies
+        with more than one parent and cycles.
+        """
+        instance = cls()
+        names, ids, parents = instance.names, instance.ids, instance.parents
+        for line_number, origin, dest in iter_orbits(file, chunk_size):
+            # intern(), inlined
+            origin_id = ids.get(origin)
+            if origin_id is None:
+                origin_id = ids[origin] = len(names)
+                names.append(origin)
+                parents.append(-1)
+            dest_id = ids.get(dest)
+            if dest_id is None:
+                ids[dest] = len(names)
+                names.append(dest)
+                parents.append(origin_id)
+                continue
+            parent = parents[dest_id]
+            if parent >= 0 and parent != origin_id:
+                raise ValueError(f'Line {line_number}: {dest} already orbits {names[parent]}, not {origin}')
+            parents[dest_id] = origin_id
+        instance._build_children()
+        # Builds the index, and finds any cycles
+        instance.index
+        return instance
+
+    @property
+    def vertices(self) -> OrbitVertices:
+        return OrbitVertices(self)
+
+    @property
+    def graph(self) -> OrbitVertex:
+        return self.vertices['COM']
+
+    @property
+    def child_offsets(self) -> np.ndarray:
+        return self._build_children(current=True)[0]
+
+    @property
+    def child_ids(self) -> np.ndarray:
+        return self._build_children(current=True)[1]
+
+    def _build_children(self, current: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """The CSR arrays, built from the parents if there are none, or if current and children changed since."""
+        if current and self._child_edits:
+            self._children = None
+            self._child_edits = {}
+        if self._children is None:
+            parents = np.frombuffer(self.parents, dtype=np.int64).copy()
+            has_parent = parents >= 0
+            # A stable sort keeps the children of every body in the order they were added
+            order = np.argsort(parents, kind='stable')
+            child_ids = order[has_parent[order]]
+            offsets = np.zeros(len(parents) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(parents[has_parent], minlength=len(parents)), out=offsets[1:])
+            self._children = offsets, child_ids
+        return self._children
+
+    def parent(self, vertex_id: int) -> Optional[int]:
+        parent = self.parents[vertex_id]
+        return None if parent < 0 else parent
+
+    def children(self, vertex_id: int) -> List[int]:
+        edited = self._child_edits.get(vertex_id)
+        if edited is not None:
+            return edited[:]
+        offsets, child_ids = self._build_children()
+        if vertex_id + 1 >= len(offsets):
+            # Added since the CSR arrays were built
+            return []
+        return child_ids[offsets[vertex_id]:offsets[vertex_id + 1]].tolist()
+
+    def orbits(self, a: int, b: int) -> bool:
+        """Whether a is b or orbits it, directly or indirectly."""
+        if self._index is not None:
+            return self._index.lca(a, b) == b
+        return a == b or b in self.ancestors(a)
+
+    def subtree(self, vertex_id: int) -> List[int]:
+        """vertex_id and all bodies that orbit it, in breadth-first order."""
+        subtree = [vertex_id]
+        for v in subtree:
+            subtree.extend(self.children(v))
+        return subtree
+
+    def ancestors(self, vertex_id: int) -> List[int]:
+        parents = self.parents
+        ancestors = []
+        while parents[vertex_id] >= 0:
+            vertex_id = parents[vertex_id]
+            ancestors.append(vertex_id)
+        return ancestors
+
+    @property
+    def index(self) -> OrbitIndex:
+        if self._index is None:
+            try:
+                self._index = OrbitIndex(np.frombuffer(self.parents, dtype=np.int64))
+            except OrbitCycleError as e:
+                cycle = self._cycle_from(e.body)
+                raise ValueError(f'Orbits form a cycle: {")".join(self.names[v] for v in cycle)}') from None
+        return self._index
+
+    def _cycle_from(self, vertex_id: int) -> List[int]:
+        """The bodies of the cycle that vertex_id is on or orbits, starting and ending at the same body."""
+        parents = self.parents
+        seen = {}
+        while vertex_id not in seen:
+            seen[vertex_id] = len(seen)
+            vertex_id = parents[vertex_id]
+        # Parents first, so that it reads as orbits
+        cycle = list(seen)[seen[vertex_id]:][::-1]
+        return cycle + cycle[:1]
+
+    def total_orbits(self) -> int:
+        return self.index.total_orbits()
+
+    def depth(self, name: str) -> int:
+        return int(self.index.depths[self.ids[name]])
+
+    def distance(self, name_a: str, name_b: str) -> int:
+        return self.index.distance(self.ids[name_a], self.ids[name_b])
+
+
+def open_orbit_file(filepath: str) -> TextIO:
+    """Open an orbit map file for reading text, decompressing it if it is gzip-compressed."""
+    with open(filepath, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    return gzip.open(filepath, 'rt') if compressed else open(filepath, 'r')
+
+
+def iter_line_chunks(file: Union[str, TextIO], chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, List[str]]]:
+    """(number of the first line, lines) for every chunk of a file, numbering lines from 1."""
+    if isinstance(file, str):
+        with open_orbit_file(file) as f:
+            yield from iter_line_chunks(f, chunk_size)
+        return
+
+    line_number = 1
+    partial = ''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        lines = (partial + chunk).split('\n')
+        # The last line may continue in the next chunk
+        partial = lines.pop()
+        yield line_number, lines
+        line_number += len(lines)
+    if partial:
+        yield line_number, [partial]
+
+
+def iter_orbits(file: Union[str, TextIO], chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, str, str]]:
+    """(line number, origin, dest) for every orbit in a file, skipping blank lines."""
+    for line_number, lines in iter_line_chunks(file, chunk_size):
+        for line_number, line in enumerate(lines, line_number):
+            origin, separator, dest = line.strip().partition(')')
+            if not origin or not dest or ')' in dest:
+                if not separator and not origin:
+                    continue
+                raise ValueError(f'Line {line_number}: malformed orbit {line!r}')
+            yield line_number, origin, dest
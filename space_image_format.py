@@ -0,0 +1,265 @@
+"""
+Decoding Space Image Format images: a string of digits, filled in layer by layer and row by row.
+0 is black, 1 is white and 2 is transparent.
+
+SpaceImage holds all layers in memory. MappedSpaceImage memory-maps a file of digits and works
+through it a bounded chunk of layers at a time, for images that are too large for that.
+SpaceImageBatch decodes many images at once, stacked by shape, optionally on a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+BLACK, WHITE, TRANSPARENT = 0, 1, 2
+# Layers MappedSpaceImage converts at a time: enough to keep numpy busy, few enough for decode() to stop early
+CHUNK_LAYERS = 256
+
+
+def parse_digits(data: Union[str, bytes]) -> np.ndarray:
+    """The digits of data as a uint8 array, without going through one string per digit."""
+    if isinstance(data, str):
+        data = data.encode('ascii')
+    return to_digits(np.frombuffer(data.strip(), dtype=np.uint8))
+
+
+def to_digits(characters: np.ndarray, offset: int = 0) -> np.ndarray:
+    """The digits of an array of ASCII characters, which starts at offset in the image."""
+    digits = characters - np.uint8(ord('0'))
+    # Characters below '0' wrap around to large values
+    if digits.size and digits.max() > 9:
+        position = int(np.argmax(digits > 9))
+        raise ValueError(f'Not a digit at position {offset + position}: {chr(characters.flat[position])!r}')
+    return digits
+
+
+def layer_histograms(layers: np.ndarray, digits: int = 10) -> np.ndarray:
+    """(layer, digit) -> number of pixels of the layer with that digit, for the first digits digits."""
+    pixels = layers.reshape((len(layers), -1))
+    # Comparing the uint8 digits one at a time saves the int64 keys per pixel a bincount would need
+    return np.stack([(pixels == digit).sum(axis=1) for digit in range(digits)], axis=1)
+
+
+def composite(layers: np.ndarray) -> np.ndarray:
+    """
+    Every pixel of the first layer where it is not transparent (or transparent if it is in all
+    layers). Layers are (layer, row, column), or (image, layer, row, column) for a stack of images.
+    """
+    first_opaque = np.argmax(layers != TRANSPARENT, axis=-3)
+    return np.take_along_axis(layers, first_opaque[..., np.newaxis, :, :], axis=-3)[..., 0, :, :]
+
+
+def stacked_checksums(stack: np.ndarray) -> np.ndarray:
+    """SpaceImage.checksum() of every image of an (image, layer, row, column) stack."""
+    pixels = stack.reshape(stack.shape[:2] + (-1,))
+    # Only three digits matter, and counting them directly saves the int64 keys of a bincount
+    zeros, ones, twos = [(pixels == digit).sum(axis=2) for digit in (0, 1, 2)]
+    fewest_zeros = np.argmin(zeros, axis=1)[:, np.newaxis]
+    return (np.take_along_axis(ones, fewest_zeros, axis=1) * np.take_along_axis(twos, fewest_zeros, axis=1))[:, 0]
+
+
+def render(image: np.ndarray) -> str:
+    return '\n'.join(' '.join(str(pixel) for pixel in row) for row in image.tolist()).replace('0', ' ')
+
+
+class SpaceImage:
+    def __init__(self, digits: np.ndarray, width: int = 25, height: int = 6):
+        layer_size = width * height
+        if layer_size <= 0 or len(digits) % layer_size:
+            raise ValueError(f'{len(digits)} digits do not make layers of {width}x{height}')
+        self.width = width
+        self.height = height
+        # (layer, row, column)
+        self.layers = np.asarray(digits, dtype=np.uint8).reshape((-1, height, width))
+
+    @classmethod
+    def from_string(cls, data: Union[str, bytes], width: int = 25, height: int = 6) -> 'SpaceImage':
+        return cls(parse_digits(data), width, height)
+
+    def histograms(self) -> np.ndarray:
+        return layer_histograms(self.layers)
+
+    def checksum(self) -> int:
+        """The number of 1 digits times the number of 2 digits in the layer with the fewest 0 digits."""
+        histograms = layer_histograms(self.layers, 3)
+        layer = histograms[np.argmin(histograms[:, 0])]
+        return int(layer[1]) * int(layer[2])
+
+    def decode(self) -> np.ndarray:
+        return composite(self.layers)
+
+    def render(self) -> str:
+        return render(self.decode())
+
+
+class MappedSpaceImage:
+    """
+    An image in a file of digits, memory-mapped and read front to back in chunks of chunk_layers
+    layers, so that only a few layers are in memory at a time.
+    Trailing whitespace in the file is ignored.
+    """
+
+    def __init__(self, filepath: str, width: int = 25, height: int = 6, chunk_layers: int = CHUNK_LAYERS):
+        if chunk_layers <= 0:
+            raise ValueError(f'Chunks need at least one layer, not {chunk_layers}')
+        self.width = width
+        self.height = height
+        self.layer_size = width * height
+        self.chunk_layers = chunk_layers
+        try:
+            characters = np.memmap(filepath, dtype=np.uint8, mode='r')
+        except ValueError:
+            # An empty file cannot be mapped
+            characters = np.zeros(0, dtype=np.uint8)
+        end = len(characters)
+        while end and chr(characters[end - 1]).isspace():
+            end -= 1
+        # A view of the mapped file, nothing is read yet
+        self.characters = characters[:end]
+        if self.layer_size <= 0 or end % self.layer_size:
+            raise ValueError(f'{end} digits do not make layers of {width}x{height}')
+        self.layer_count = end // self.layer_size
+        # Layers the last decode() needed to look at
+        self.layers_decoded = 0
+
+    def iter_chunks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """(index of the first layer, layers) for every chunk, as (layer, row, column) digit arrays."""
+        step = self.chunk_layers * self.layer_size
+        for start in range(0, len(self.characters), step):
+            digits = to_digits(self.characters[start:start + step], start)
+            yield start // self.layer_size, digits.reshape((-1, self.height, self.width))
+
+    def iter_histograms(self, digits: int = 10) -> Iterator[np.ndarray]:
+        """The histogram of the first digits digits of every layer, as they are read."""
+        for _, layers in self.iter_chunks():
+            yield from layer_histograms(layers, digits)
+
+    def checksum(self) -> int:
+        fewest_zeros = None
+        for histogram in self.iter_histograms(3):
+            if fewest_zeros is None or histogram[0] < fewest_zeros[0]:
+                fewest_zeros = histogram
+        if fewest_zeros is None:
+            raise ValueError('The image has no layers')
+        return int(fewest_zeros[1]) * int(fewest_zeros[2])
+
+    def decode(self) -> np.ndarray:
+        """Composite the layers front to back, and stop reading once no pixel is transparent any more."""
+        image = np.full((self.height, self.width), TRANSPARENT, dtype=np.uint8)
+        self.layers_decoded = 0
+        for first_layer, layers in self.iter_chunks():
+            transparent = image == TRANSPARENT
+            image[transparent] = composite(layers)[transparent]
+            self.layers_decoded = first_layer + len(layers)
+            if not (image == TRANSPARENT).any():
+                break
+        return image
+
+    def render(self) -> str:
+        return render(self.decode())
+
+
+class DecodedImage(NamedTuple):
+    checksum: int
+    # (row, column)
+    image: np.ndarray
+
+
+def _shared_array(memory: SharedMemory, shape: Tuple[int, ...]) -> np.ndarray:
+    return np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+
+
+def _decode_shared(stack_name: str, images_name: str, shape: Tuple[int, int, int, int], start: int,
+                   stop: int) -> np.ndarray:
+    """Decode images start:stop of a stack in shared memory, into shared memory, and return their checksums."""
+    stack_memory = SharedMemory(name=stack_name)
+    images_memory = SharedMemory(name=images_name)
+    try:
+        stack = _shared_array(stack_memory, shape)[start:stop]
+        images = _shared_array(images_memory, (shape[0],) + shape[2:])
+        images[start:stop] = composite(stack)
+        checksums = stacked_checksums(stack)
+        # The arrays have to go before the memory can be closed
+        del stack, images
+        return checksums
+    finally:
+        stack_memory.close()
+        images_memory.close()
+
+
+class SpaceImageBatch:
+    """
+    Decode many images, given as (digits, width, height), which may have different sizes. Images
+    of the same shape are stacked into one (image, layer, row, column) array and decoded together.
+
+    With workers=1 everything runs in this process. Otherwise every stack is written to shared
+    memory once and split into chunks of at most chunk_size images for a process pool; the workers
+    read the stack and write the decoded images in place, so only the checksums are pickled. Either
+    way the results are those of SpaceImage.checksum() and decode(), in the order of the images.
+    """
+
+    def __init__(self, images: Sequence[Tuple[Union[str, bytes, np.ndarray], int, int]],
+                 workers: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.images = list(images)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+
+    def groups(self) -> Dict[Tuple[int, int, int], List[Tuple[int, np.ndarray]]]:
+        """(layers, height, width) -> (position, digits) of every image of that shape."""
+        groups: Dict[Tuple[int, int, int], List[Tuple[int, np.ndarray]]] = {}
+        for position, (data, width, height) in enumerate(self.images):
+            digits = parse_digits(data) if isinstance(data, (str, bytes)) else np.asarray(data, dtype=np.uint8)
+            layer_size = width * height
+            if layer_size <= 0 or len(digits) % layer_size:
+                raise ValueError(f'Image {position}: {len(digits)} digits do not make layers of {width}x{height}')
+            groups.setdefault((len(digits) // layer_size, height, width), []).append((position, digits))
+        return groups
+
+    def run(self) -> List[DecodedImage]:
+        results: List[Optional[DecodedImage]] = [None] * len(self.images)
+        groups = self.groups()
+        if self.workers <= 1:
+            for shape, members in groups.items():
+                stack = np.stack([digits for _, digits in members]).reshape((len(members),) + shape)
+                self._collect(results, members, stacked_checksums(stack), composite(stack))
+            return results
+
+        chunk_size = self.chunk_size
+        if chunk_size is None:
+            # A few chunks per worker keeps the pool busy when the groups have unequal sizes
+            chunk_size = max(1, len(self.images) // (self.workers * 4))
+        memories: List[SharedMemory] = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                jobs = []
+                for shape, members in groups.items():
+                    stack_shape = (len(members),) + shape
+                    stack_memory = SharedMemory(create=True, size=max(1, int(np.prod(stack_shape))))
+                    images_memory = SharedMemory(create=True, size=max(1, len(members) * shape[1] * shape[2]))
+                    memories += [stack_memory, images_memory]
+                    stack = _shared_array(stack_memory, stack_shape)
+                    for row, (_, digits) in zip(stack, members):
+                        row.reshape(-1)[:] = digits
+                    del stack
+                    futures = [executor.submit(_decode_shared, stack_memory.name, images_memory.name, stack_shape,
+                                               start, start + chunk_size)
+                               for start in range(0, len(members), chunk_size)]
+                    jobs.append((members, images_memory, (len(members),) + shape[1:], futures))
+
+                for members, images_memory, images_shape, futures in jobs:
+                    checksums = np.concatenate([future.result() for future in futures])
+                    images = _shared_array(images_memory, images_shape).copy()
+                    self._collect(results, members, checksums, images)
+        finally:
+            for memory in memories:
+                memory.close()
+                memory.unlink()
+        return results
+
+    @staticmethod
+    def _collect(results: List[Optional[DecodedImage]], members: List[Tuple[int, np.ndarray]],
+                 checksums: np.ndarray, images: np.ndarray):
+        for (position, _), checksum, image in zip(members, checksums.tolist(), images):
+            results[position] = DecodedImage(checksum, image)
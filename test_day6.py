@@ -0,0 +1,259 @@
+import gzip
+import io
+import os
+import random
+import re
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from day6 import UniverseOrbitMap
+from orbit_map import CompactOrbitMap, OrbitIndex, iter_orbits
+
+
+class TestUniverseOrbitMap(TestCase):
+    def setUp(self):
+        self.universe_map = UniverseOrbitMap.from_file('./test_input')
+
+    def test_total_orbits(self):
+        expected = sum(len(vertex.get_all_parents()) for vertex in self.universe_map.vertices.values())
+        self.assertEqual(54, expected)
+        self.assertEqual(expected, self.universe_map.total_orbits())
+        self.assertEqual(7, self.universe_map.depth('YOU'))
+
+    def test_distance(self):
+        self.assertEqual(4, self.universe_map.distance('YOU', 'SAN'))
+        names = list(self.universe_map.vertices)
+        for a in names:
+            for b in names:
+                with self.subTest(a=a, b=b):
+                    expected = self.universe_map.vertices[a].distance_to(self.universe_map.vertices[b])
+                    self.assertEqual(expected, self.universe_map.distance(a, b))
+
+        index = self.universe_map.index
+        pairs = [(a, b) for a in range(len(names)) for b in range(len(names))]
+        self.assertEqual([index.distance(a, b) for a, b in pairs],
+                         index.distances([a for a, _ in pairs], [b for _, b in pairs]).tolist())
+
+    def test_index_follows_new_edges(self):
+        self.assertEqual(4, self.universe_map.distance('YOU', 'SAN'))
+        index = self.universe_map.index
+        self.universe_map.add_edge('SAN', 'MOON')
+        self.assertEqual(5, self.universe_map.distance('YOU', 'MOON'))
+        self.assertEqual(60, self.universe_map.total_orbits())
+        # A tree of new bodies joins the map under YOU
+        self.universe_map.add_edge('X', 'Y')
+        self.universe_map.add_edge('Y', 'Z')
+        self.assertIsNone(index.lca(self.universe_map._ids['X'], self.universe_map._ids['COM']))
+        self.universe_map.add_edge('YOU', 'X')
+        self.assertIs(index, self.universe_map.index)
+        self.assertEqual(60 + 8 + 9 + 10, self.universe_map.total_orbits())
+        self.assertEqual(3, self.universe_map.distance('SAN', 'Z') - self.universe_map.distance('SAN', 'YOU'))
+        with self.assertRaisesRegex(ValueError, 'COM cannot orbit Z, which orbits it'):
+            self.universe_map.add_edge('Z', 'COM')
+
+        rebuilt = UniverseOrbitMap()
+        for name, vertex in self.universe_map.vertices.items():
+            for child in vertex.child_nodes:
+                rebuilt.add_edge(name, child.name)
+        self.assertEqual(rebuilt.total_orbits(), self.universe_map.total_orbits())
+        for name in self.universe_map.vertices:
+            self.assertEqual(rebuilt.depth(name), self.universe_map.depth(name))
+
+    def test_second_parent(self):
+        self.universe_map.add_edge('K', 'L')
+        self.assertEqual(54, self.universe_map.total_orbits())
+        self.assertEqual(['L', 'YOU'], sorted(child.name for child in self.universe_map.vertices['K'].child_nodes))
+        with self.assertRaisesRegex(ValueError, 'L already orbits K, not B'):
+            self.universe_map.add_edge('B', 'L')
+        self.assertEqual('K', self.universe_map.vertices['L'].parent.name)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orbits')
+            with open(path, 'w') as f:
+                f.write('COM)B\nB)C\nCOM)C\n')
+            with self.assertRaisesRegex(ValueError, 'Line 3: C already orbits B, not COM'):
+                UniverseOrbitMap.from_file(path)
+
+    def test_lca_random_tree(self):
+        rng = random.Random(6)
+        parents = [-1] + [rng.randrange(i) for i in range(1, 2000)]
+        index = OrbitIndex(parents)
+
+        def ancestors(v):
+            path = [v]
+            while parents[v] >= 0:
+                v = parents[v]
+                path.append(v)
+            return path
+
+        pairs = [(rng.randrange(2000), rng.randrange(2000)) for _ in range(300)]
+        for a, b in pairs:
+            b_ancestors = set(ancestors(b))
+            expected = next(v for v in ancestors(a) if v in b_ancestors)
+            self.assertEqual(expected, index.lca(a, b))
+        self.assertEqual([index.lca(a, b) for a, b in pairs],
+                         index.lcas([a for a, _ in pairs], [b for _, b in pairs]).tolist())
+
+    def test_separate_trees_and_cycles(self):
+        index = OrbitIndex([-1, 0, -1, 2])
+        self.assertIsNone(index.lca(1, 3))
+        self.assertEqual([-1], index.lcas([1], [3]).tolist())
+        with self.assertRaises(ValueError):
+            index.distance(1, 3)
+        with self.assertRaises(ValueError):
+            OrbitIndex([-1, 2, 1])
+
+
+class TestCompactOrbitMap(TestCase):
+    def setUp(self):
+        self.universe_map = UniverseOrbitMap.from_file('./test_input')
+        self.compact_map = CompactOrbitMap.from_file('./test_input')
+
+    def test_same_queries(self):
+        self.assertEqual(list(self.universe_map.vertices), list(self.compact_map.vertices))
+        self.assertEqual(repr(self.universe_map.graph), repr(self.compact_map.graph))
+        self.assertEqual(54, self.compact_map.total_orbits())
+        self.assertEqual(4, self.compact_map.distance('YOU', 'SAN'))
+        for name, vertex in self.universe_map.vertices.items():
+            view = self.compact_map.vertices[name]
+            with self.subTest(name=name):
+                self.assertEqual(vertex.name, view.name)
+                self.assertEqual(repr(vertex), repr(view))
+                self.assertEqual([child.name for child in vertex.child_nodes], [child.name for child in view.child_nodes])
+                self.assertEqual([parent.name for parent in vertex.get_all_parents()],
+                                 [parent.name for parent in view.get_all_parents()])
+                self.assertEqual(vertex.distance_to(self.universe_map.vertices['SAN']),
+                                 view.distance_to(self.compact_map.vertices['SAN']))
+        self.assertIsNone(self.compact_map.graph.parent)
+        self.assertEqual(self.compact_map.vertices['B'], self.compact_map.vertices['C'].parent)
+
+    def test_children_follow_new_edges(self):
+        compact_map = self.compact_map
+        self.assertEqual(['C', 'G'], [child.name for child in compact_map.vertices['B'].child_nodes])
+        compact_map.add_edge('B', 'MOON')
+        compact_map.add_edge('MOON', 'STATION')
+        self.assertEqual(['C', 'G', 'MOON'], [child.name for child in compact_map.vertices['B'].child_nodes])
+        self.assertEqual(compact_map.ids['STATION'], compact_map.child_ids[compact_map.child_offsets[compact_map.ids['MOON']]])
+        self.assertEqual(3, compact_map.depth('STATION'))
+        self.assertEqual(54 + 2 + 3, compact_map.total_orbits())
+
+    def test_from_file(self):
+        with open('./test_input') as f:
+            lines = f.read().splitlines()
+        shuffled = lines[:]
+        random.Random(18).shuffle(shuffled)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orbits.gz')
+            with gzip.open(path, 'wt') as f:
+                f.write('\r\n'.join(shuffled) + '\r\n\n')
+            for chunk_size in (3, 1 << 20):
+                with self.subTest(chunk_size=chunk_size):
+                    compact_map = CompactOrbitMap.from_file(path, chunk_size)
+                    self.assertEqual(54, compact_map.total_orbits())
+                    self.assertEqual(4, compact_map.distance('YOU', 'SAN'))
+                    self.assertEqual(sorted(self.universe_map.vertices), sorted(compact_map.vertices))
+
+    def test_from_file_errors(self):
+        def load(text):
+            return CompactOrbitMap.from_file(io.StringIO(text), chunk_size=4)
+
+        for text, message in [('COM)B\nB)C)D\n', 'Line 2: malformed orbit'),
+                              ('COM)B\n\nB\n', 'Line 3: malformed orbit'),
+                              ('COM)B\nB)\n', 'Line 2: malformed orbit'),
+                              ('COM)B\nCOM)C\nB)D\nC)D\n', 'Line 4: D already orbits B, not C'),
+                              ('COM)B\nC)D\nD)E\nE)C\n', 'cycle: D)E)C)D')]:
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ValueError, re.escape(message)):
+                    load(text)
+        self.assertEqual(1, load('COM)B\nCOM)B\n').total_orbits())
+
+    def assert_consistent(self, compact_map):
+        index = compact_map.index
+        rebuilt = OrbitIndex(compact_map.parents)
+        self.assertEqual(rebuilt.depths.tolist(), index.depths.tolist())
+        self.assertEqual(rebuilt.roots.tolist(), index.roots.tolist())
+        self.assertEqual(rebuilt.total_orbits(), index.total_orbits())
+        n = len(compact_map.names)
+        rng = random.Random(n)
+        a = [rng.randrange(n) for _ in range(200)]
+        b = [rng.randrange(n) for _ in range(200)]
+        self.assertEqual(rebuilt.lcas(a, b).tolist(), index.lcas(a, b).tolist())
+        for v in range(n):
+            self.assertEqual(sorted(u for u in range(n) if compact_map.parents[u] == v), sorted(compact_map.children(v)))
+
+    def test_incremental_updates(self):
+        rng = random.Random(19)
+        compact_map = CompactOrbitMap()
+        for i in range(1, 300):
+            compact_map.add_edge(f'N{rng.randrange(i)}', f'N{i}')
+        compact_map.total_orbits()
+        for step in range(300):
+            names = compact_map.names
+            name = rng.choice(names)
+            vertex_id = compact_map.ids[name]
+            operation = rng.choice(['add', 'remove', 'move'])
+            if operation == 'add':
+                compact_map.add_edge(name, f'M{step}')
+            elif operation == 'remove' and compact_map.parents[vertex_id] >= 0:
+                compact_map.remove_edge(names[compact_map.parents[vertex_id]], name)
+            elif operation == 'move':
+                parent = rng.choice(names)
+                if compact_map.orbits(compact_map.ids[parent], vertex_id):
+                    with self.assertRaises(ValueError):
+                        compact_map.move_subtree(name, parent)
+                else:
+                    compact_map.move_subtree(name, parent)
+            if step % 30 == 0:
+                self.assert_consistent(compact_map)
+        self.assert_consistent(compact_map)
+        # Children that changed are folded back into the CSR arrays
+        offsets, child_ids = compact_map.child_offsets, compact_map.child_ids
+        self.assertEqual(len(compact_map.names) + 1, len(offsets))
+        self.assertEqual(compact_map.children(0), child_ids[offsets[0]:offsets[1]].tolist())
+
+    def test_update_errors(self):
+        compact_map = self.compact_map
+        compact_map.total_orbits()
+        with self.assertRaisesRegex(ValueError, 'D already orbits C, not B'):
+            compact_map.add_edge('B', 'D')
+        with self.assertRaisesRegex(ValueError, 'D does not orbit B'):
+            compact_map.remove_edge('B', 'D')
+        with self.assertRaisesRegex(ValueError, 'PLUTO does not orbit B'):
+            compact_map.remove_edge('B', 'PLUTO')
+        with self.assertRaisesRegex(ValueError, 'D does not orbit PLUTO'):
+            compact_map.remove_edge('PLUTO', 'D')
+        with self.assertRaisesRegex(ValueError, 'PLUTO is not in the map'):
+            compact_map.move_subtree('PLUTO', 'D')
+        with self.assertRaisesRegex(ValueError, 'D cannot orbit YOU, which orbits it'):
+            compact_map.move_subtree('D', 'YOU')
+        # D and the 8 bodies that orbit it move one level down, then four levels up
+        compact_map.move_subtree('D', 'H')
+        self.assertEqual(54 + 9, compact_map.total_orbits())
+        compact_map.remove_edge('H', 'D')
+        self.assertEqual(54 + 9 - 4 * 9, compact_map.total_orbits())
+        with self.assertRaises(ValueError):
+            compact_map.distance('YOU', 'COM')
+        self.assert_consistent(compact_map)
+
+    def test_apply(self):
+        # Updating the index edit by edit, rebuilding it, and building it only when it is needed
+        for rebuild_fraction, index_built in [(0, True), (64, True), (64, False)]:
+            with self.subTest(rebuild_fraction=rebuild_fraction, index_built=index_built), \
+                    patch('orbit_map.REBUILD_FRACTION', rebuild_fraction):
+                compact_map = CompactOrbitMap()
+                for _, origin, dest in iter_orbits('./test_input'):
+                    compact_map.add_edge(origin, dest)
+                if index_built:
+                    compact_map.total_orbits()
+                edits = [('add', 'YOU', 'MOON'), ('move', 'SAN', 'MOON'), ('remove', 'J', 'K')]
+                compact_map.apply(edits)
+                self.assertEqual(2, compact_map.distance('SAN', 'YOU'))
+                self.assertEqual(36, compact_map.total_orbits())
+                self.assert_consistent(compact_map)
+
+                with self.assertRaisesRegex(ValueError, 'cannot orbit'):
+                    compact_map.apply([('move', 'SAN', 'COM'), ('add', 'L', 'STATION'), ('move', 'K', 'STATION')])
+                self.assertEqual(2, compact_map.distance('SAN', 'YOU'))
+                self.assertEqual(36, compact_map.total_orbits())
+                self.assertEqual(-1, compact_map.parents[compact_map.ids['STATION']])
+                self.assert_consistent(compact_map)
@@ -1,8 +1,23 @@
+import asyncio
+import io
 import logging
-from itertools import permutations
+import os
+import tempfile
+import time
+from itertools import count, permutations
 from unittest import TestCase
 
-from intcode_computer import IntcodeComputer
+from amplifier_search import AmplifierSearch, LRUCache, MemoizedAmplifierSearch
+from intcode_batch import BatchIntcodeComputer
+from intcode_benchmark import StepCounter, compare, countdown_loop, large_address_loop, relative_loop
+from intcode_compiler import CompiledIntcodeComputer
+from intcode_computer import ComputerMemory, IntcodeComputer
+from intcode_disassembler import ProgramAnalysis
+from intcode_loader import load_image, load_program, load_text, save_image
+from intcode_network import IntcodeNetwork
+from intcode_profile import Profiler
+from intcode_scheduler import Scheduler
+from intcode_trace import FileTracer, read_trace
 
 
 class TestIntcodeComputer(TestCase):
@@ -136,3 +151,539 @@ class TestIntcodeComputer(TestCase):
             expected_output = data[name]['expected_output']
             with self.subTest(name):
                 self.assertEqual(expected_output, test_output)
+
+    def test_relative_mode_write(self):
+        computer = IntcodeComputer([109, 1, 203, 2, 204, 2, 99])
+        self.assertEqual(42, computer.run(42))
+
+    def test_self_modifying_code(self):
+        # Outputs 1, overwrites its first instruction with a halt and jumps back to it
+        computer = IntcodeComputer([104, 1, 1101, 0, 99, 0, 1105, 1, 0])
+        self.assertEqual(1, computer.run())
+        self.assertTrue(computer.finished)
+
+    def test_sparse_memory(self):
+        # Reads and writes far beyond the program image
+        computer = IntcodeComputer([1101, 7, 0, 1000000000, 4, 1000000000, 4, 2000000000, 99])
+        self.assertEqual([7, 0], computer.run())
+        self.assertEqual(9 + ComputerMemory.PAGE_SIZE, computer.memory.resident_cells)
+
+    def test_memory_limit(self):
+        computer = IntcodeComputer([1101, 7, 0, 1000000000, 99], memory_limit=100)
+        with self.assertRaises(MemoryError):
+            computer.run()
+
+    def test_trace_replay(self):
+        trace_file = io.BytesIO()
+        tracer = FileTracer(trace_file)
+        computer = IntcodeComputer(self.DAY_5_MEMORY_2, tracer=tracer)
+        computer.run(5)
+        tracer.flush()
+
+        trace_file.seek(0)
+        events = list(read_trace(trace_file))
+        self.assertEqual([0, 2, 9, 11], [event.index for event in events])
+        self.assertEqual([3, 1105, 4, 99], [event.instruction for event in events])
+
+    def test_compiled_engine(self):
+        programs = [
+            (self.DAY_5_MEMORY_1, (5,), 1),
+            (self.DAY_5_MEMORY_2, (0,), 0),
+            (self.DAY_7_MEMORY_3, (1, 0), 6),
+            ([109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99], (),
+             [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]),
+            ([1102, 34915192, 34915192, 7, 4, 7, 99, 0], (), 1219070632396864),
+            ([109, 1, 203, 2, 204, 2, 99], (42,), 42),
+        ]
+        for memory, inputs, expected_output in programs:
+            with self.subTest(memory=memory):
+                self.assertEqual(expected_output, CompiledIntcodeComputer(memory).run(*inputs))
+                self.assertEqual(IntcodeComputer(memory).run(*inputs), CompiledIntcodeComputer(memory).run(*inputs))
+
+    def test_compiled_engine_self_modifying_code(self):
+        # The first instruction overwrites the output instruction that follows it with a halt
+        computer = CompiledIntcodeComputer([1101, 0, 99, 4, 104, 7, 99])
+        self.assertIsNone(computer.run())
+        self.assertTrue(computer.finished)
+
+        computer = CompiledIntcodeComputer([104, 1, 1101, 0, 99, 0, 1105, 1, 0])
+        self.assertEqual(1, computer.run())
+        self.assertTrue(computer.finished)
+
+    def test_compiled_engine_resumes_after_input(self):
+        computer = CompiledIntcodeComputer([3, 11, 3, 12, 1, 11, 12, 13, 4, 13, 99, 0, 0, 0])
+        self.assertIsNone(computer.run(1))
+        self.assertTrue(computer.halted)
+        self.assertEqual(3, computer.run(2))
+
+    def test_fork(self):
+        for engine in (IntcodeComputer, CompiledIntcodeComputer):
+            with self.subTest(engine.__name__):
+                computer = engine(self.DAY_7_MEMORY_1)
+                computer.input_values = [4]
+                computer.process_step()
+
+                forks = [computer.fork() for _ in range(3)]
+                self.assertEqual([43174, 43184, 43194], [fork.run(n) for n, fork in enumerate(forks, start=4317)])
+                # The paused original is untouched by its forks
+                self.assertEqual(43174, computer.run(4317))
+
+    def test_snapshot_restore(self):
+        computer = IntcodeComputer([3, 100000, 4, 100000, 3, 0, 99])
+        computer.run(7)
+        state = computer.snapshot()
+
+        computer.run(42)
+        self.assertTrue(computer.finished)
+        self.assertEqual(42, computer.memory[0])
+
+        computer.restore(state)
+        self.assertFalse(computer.finished)
+        self.assertEqual(7, computer.memory[100000])
+        self.assertEqual(3, computer.memory[0])
+        self.assertEqual(7, computer.run(1))
+        self.assertEqual(1, computer.memory[0])
+
+    def test_waiting_for_input(self):
+        for engine in (IntcodeComputer, CompiledIntcodeComputer):
+            with self.subTest(engine.__name__):
+                computer = engine([3, 100000, 4, 100000, 3, 0, 99])
+                self.assertIsNone(computer.run())
+                self.assertEqual(IntcodeComputer.WAITING, computer.status)
+                self.assertEqual(IntcodeComputer.WAITING, computer.run_slice())
+                # A state taken while waiting runs the input instruction again
+                state = computer.snapshot()
+                self.assertEqual(0, state.index)
+
+                self.assertEqual(7, computer.run(7))
+                self.assertEqual(IntcodeComputer.WAITING, computer.status)
+                self.assertEqual(1, computer.inputs_consumed)
+                computer.restore(state)
+                self.assertEqual(8, computer.run(8, 42))
+                self.assertEqual(IntcodeComputer.FINISHED, computer.status)
+                self.assertEqual(42, computer.memory[0])
+
+    def test_step_budget(self):
+        boost = load_program('./day9input')
+        engines = {
+            'interpreter': IntcodeComputer,
+            'fused': lambda memory: IntcodeComputer(memory, fuse=True),
+            'compiled': CompiledIntcodeComputer,
+            'traced': lambda memory: IntcodeComputer(memory, tracer=StepCounter()),
+        }
+        for name, engine in engines.items():
+            with self.subTest(name):
+                computer = engine(boost)
+                self.assertEqual(2955820355, computer.run(1))
+                self.assertEqual(206, computer.instructions)
+                # A budget that is never used up
+                expected = engine(boost)
+                self.assertEqual(2955820355, expected.run(1, max_steps=10 ** 6))
+                self.assertEqual(206, expected.instructions)
+
+                computer = engine(boost)
+                computer.feed(1)
+                slices = 0
+                while computer.run_slice(max_steps=7) == IntcodeComputer.PAUSED:
+                    slices += 1
+                    self.assertEqual(7 * slices, computer.steps)
+                self.assertEqual(IntcodeComputer.FINISHED, computer.status)
+                self.assertEqual(2955820355, computer.output_values[0])
+                self.assertEqual((expected.steps + 6) // 7 - 1, slices)
+                self.assertEqual(expected.steps, computer.steps)
+                self.assertEqual(expected.instructions, computer.instructions)
+
+        # A superinstruction is one step for two instructions
+        fused = IntcodeComputer(boost, fuse=True)
+        fused.run(1)
+        self.assertLess(fused.steps, fused.instructions)
+
+        # Budgets also apply to the loops that wait for output
+        computer = IntcodeComputer(countdown_loop(100))
+        computer.run(max_steps=10)
+        self.assertEqual((10, 10, IntcodeComputer.PAUSED), (computer.steps, computer.instructions, computer.status))
+        self.assertEqual([], list(computer.stream()))
+        self.assertEqual(201, computer.steps)
+
+    def test_step_counters(self):
+        # Adds 1 and 1 and outputs the sum: three instructions, in one compiled block. A compiled block
+        # ends after an input instruction, so the halt that follows it is a block of its own.
+        for engine, steps, steps_after_input in ((IntcodeComputer, 3, 2), (CompiledIntcodeComputer, 1, 3)):
+            with self.subTest(engine.__name__):
+                computer = engine([1101, 1, 1, 9, 4, 9, 99, 0, 0, 0])
+                self.assertEqual(2, computer.run())
+                self.assertEqual((steps, 3), (computer.steps, computer.instructions))
+
+                # An input instruction that waits is a step, and an instruction once it completes
+                computer = engine([3, 0, 99])
+                self.assertEqual(IntcodeComputer.WAITING, computer.run_slice(max_steps=10))
+                self.assertEqual((1, 0), (computer.steps, computer.instructions))
+                computer.feed(5)
+                self.assertEqual(IntcodeComputer.FINISHED, computer.run_slice(max_steps=10))
+                self.assertEqual((steps_after_input, 2), (computer.steps, computer.instructions))
+
+        instructions = []
+        for engine in (IntcodeComputer, CompiledIntcodeComputer):
+            computer = engine(self.DAY_7_MEMORY_1)
+            computer.run(4)
+            list(computer.stream([3]))
+            instructions.append(computer.instructions)
+        self.assertEqual([instructions[0]] * 2, instructions)
+
+    def test_deadline(self):
+        for engine in (IntcodeComputer, CompiledIntcodeComputer):
+            with self.subTest(engine.__name__):
+                # Jumps to itself forever
+                computer = engine([1105, 1, 0])
+                self.assertEqual(IntcodeComputer.PAUSED, computer.run_slice(deadline=time.monotonic() + 0.01))
+                self.assertGreaterEqual(computer.steps, computer.DEADLINE_CHECK_STEPS)
+                steps = computer.steps
+                self.assertEqual(IntcodeComputer.PAUSED, computer.run_slice(max_steps=5, deadline=time.monotonic() + 1))
+                self.assertEqual(steps + 5, computer.steps)
+
+    def test_scheduler(self):
+        scheduler = Scheduler(workers=2, slice_steps=100)
+        scheduler.add('runaway', IntcodeComputer([1105, 1, 0]), max_steps=2000)
+        scheduler.add('boost', IntcodeComputer(load_program('./day9input')), 1)
+        scheduler.add('compiled', CompiledIntcodeComputer(relative_loop(300)))
+        scheduler.add('waiting', IntcodeComputer(self.DAY_7_MEMORY_1), 4)
+        self.assertEqual({'runaway': 'paused', 'boost': 'finished', 'compiled': 'finished', 'waiting': 'waiting'},
+                         scheduler.run())
+        self.assertEqual({'runaway': [], 'boost': [2955820355], 'compiled': [300], 'waiting': []}, scheduler.outputs)
+        self.assertEqual(2000, scheduler.computers['runaway'].steps)
+        self.assertEqual(0, scheduler.remaining_steps('runaway'))
+        self.assertEqual(20, scheduler.slices['runaway'])
+
+        scheduler.feed('waiting', 3)
+        self.assertEqual('finished', scheduler.run()['waiting'])
+        self.assertEqual([34], scheduler.outputs['waiting'])
+        with self.assertRaisesRegex(ValueError, 'already scheduled'):
+            scheduler.add('boost', IntcodeComputer([99]))
+
+    def test_amplifier_search(self):
+        for name, memory in [
+            ('Day 7 test 1', self.DAY_7_MEMORY_1),
+            ('Day 7 test 2', self.DAY_7_MEMORY_2),
+            ('Day 7 test 3', self.DAY_7_MEMORY_3),
+        ]:
+            for workers in (1, 2):
+                with self.subTest(f'{name} workers: {workers}'):
+                    result = AmplifierSearch(memory, workers=workers).run()
+                    self.assertEqual(self.DAY_7_EXPECTED_OUTCOMES[name], result)
+
+    def test_amplifier_search_feedback(self):
+        memory = [3, 26, 1001, 26, -4, 26, 3, 27, 1002, 27, 2, 27, 1, 27, 26, 27, 4, 27, 1001, 28, -1, 28, 1005, 28, 6,
+                  99, 0, 0, 5]
+        for engine in (IntcodeComputer, CompiledIntcodeComputer):
+            with self.subTest(engine.__name__):
+                result = AmplifierSearch(memory, phases=range(5, 10), feedback=True, engine=engine, workers=1).run()
+                self.assertEqual(((9, 8, 7, 6, 5), 139629729), result)
+
+    def test_memoized_amplifier_search(self):
+        day7 = load_program('./day7input')
+        for name, memory, phases, feedback in [
+            ('Day 7 test 1', self.DAY_7_MEMORY_1, range(5), False),
+            ('Day 7 test 3', self.DAY_7_MEMORY_3, range(5), False),
+            ('Day 7 test 3, 3 of 6 phases', self.DAY_7_MEMORY_3, range(6), False),
+            ('Day 7 puzzle', day7, range(5), False),
+            ('Day 7 puzzle feedback', day7, range(5, 10), True),
+        ]:
+            for engine in (IntcodeComputer, CompiledIntcodeComputer):
+                with self.subTest(name, engine=engine.__name__):
+                    length = 3 if '3 of 6' in name else None
+                    search = MemoizedAmplifierSearch(memory, phases=phases, length=length, feedback=feedback,
+                                                     engine=engine, cache_size=16)
+                    expected = AmplifierSearch(memory, phases=phases, length=length, feedback=feedback,
+                                               engine=engine, workers=1).run()
+                    self.assertEqual(expected, search.run())
+                    self.assertLessEqual(len(search.cache), 16)
+                    self.assertIn('hit rate', search.stats())
+
+        # Every prefix is looked up once: 5 + 20 + 60 + 120 + 120 times instead of 5 * 120 runs, and
+        # only misses run (after reading each of the 5 phases once)
+        search = MemoizedAmplifierSearch(self.DAY_7_MEMORY_1)
+        search.run()
+        self.assertEqual(325, search.cache.hits + search.cache.misses)
+        self.assertEqual(5 + search.cache.misses, search.executions)
+        # The puzzle's amplifiers only depend on a few signals
+        search = MemoizedAmplifierSearch(day7)
+        search.run()
+        self.assertLess(search.executions, 300)
+        self.assertGreater(search.cache.hit_rate, 0.1)
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((1, 1, 0.5), (cache.hits, cache.misses, cache.hit_rate))
+        self.assertEqual(2, len(cache))
+
+    def test_network_feedback_loop(self):
+        memory = [3, 52, 1001, 52, -5, 52, 3, 53, 1, 52, 56, 54, 1007, 54, 5, 55, 1005, 55, 26, 1001, 54, -5, 54, 1105,
+                  1, 12, 1, 53, 54, 53, 1008, 54, 0, 55, 1001, 55, 1, 55, 2, 53, 55, 53, 4, 53, 1001, 56, -1, 56, 1005,
+                  56, 6, 99, 0, 0, 0, 0, 10]
+        network = IntcodeNetwork.amplifiers(memory, (9, 7, 8, 5, 6), feedback=True, channel_size=2)
+        self.assertEqual(18216, asyncio.run(network.run())['amplifier 4'])
+
+    def test_network_router(self):
+        # Every computer outputs its input plus one, the router sends odd values to 'odd' and the rest to 'even'
+        increment = [3, 9, 1001, 9, 1, 9, 4, 9, 99, 0]
+        network = IntcodeNetwork()
+        for name in ('source', 'odd', 'even'):
+            network.add(name, IntcodeComputer(increment))
+        network.route('source', lambda value: 'odd' if value % 2 else 'even')
+        network.send('source', 4)
+        asyncio.run(network.run())
+        self.assertEqual({'source': [], 'odd': [6], 'even': []}, network.outputs)
+        self.assertTrue(network.computers['odd'].finished)
+        self.assertFalse(network.computers['even'].finished)
+
+    def test_network_time_slices(self):
+        # Output a countdown from n without reading any input, into a computer that reads forever
+        def countdown(n):
+            return [4, 11, 1001, 11, -1, 11, 1005, 11, 0, 99, 0, n]
+
+        received = []
+        network = IntcodeNetwork(channel_size=2, slice_steps=10)
+        network.add('sink', IntcodeComputer([3, 5, 1105, 1, 0, 0]))
+        for name in ('a', 'b'):
+            network.add(name, IntcodeComputer(countdown(100)))
+            network.route(name, lambda value, name=name: received.append(name) or 'sink')
+        asyncio.run(network.run())
+        self.assertEqual(200, len(received))
+        # Neither computer runs to the end before the other one gets its turn
+        self.assertIn('b', received[:10])
+        self.assertIn('a', received[100:])
+        self.assertEqual(1, network.last_output['a'])
+
+    def test_stream(self):
+        quine = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+        for engine in (IntcodeComputer, CompiledIntcodeComputer):
+            with self.subTest(engine.__name__):
+                self.assertEqual(quine, list(engine(quine).iter_outputs()))
+
+                # Outputs each input plus one until the input is zero; input is only pulled when needed
+                pulled = []
+
+                def inputs():
+                    for value in [3, 2, 1, 0, 10]:
+                        pulled.append(value)
+                        yield value
+
+                computer = engine([3, 20, 1006, 20, 14, 101, 1, 20, 21, 4, 21, 1105, 1, 0, 99])
+                stream = computer.stream(inputs())
+                self.assertEqual(4, next(stream))
+                self.assertEqual([3], pulled)
+                self.assertEqual([3, 2], list(stream))
+                self.assertEqual([3, 2, 1, 0], pulled)
+                self.assertTrue(computer.finished)
+
+    def test_stream_keeps_no_outputs(self):
+        # Counts down from the input, outputting every value
+        computer = IntcodeComputer([3, 100, 4, 100, 1001, 100, -1, 100, 1005, 100, 2, 99])
+        for produced, value in enumerate(computer.stream([10000])):
+            self.assertEqual(10000 - produced, value)
+            self.assertFalse(computer.output_values)
+        self.assertTrue(computer.finished)
+
+    def test_feed(self):
+        # Adds two inputs
+        computer = IntcodeComputer([3, 11, 3, 12, 1, 11, 12, 13, 4, 13, 99, 0, 0, 0])
+        computer.feed(1)
+        computer.feed(2, 3)
+        self.assertEqual(3, computer.run())
+        self.assertEqual(2, computer.inputs_consumed)
+        self.assertEqual(1, computer.outputs_produced)
+        self.assertEqual([3], list(computer.input_values))
+
+    def test_output_ring_buffer(self):
+        # Outputs 5, 4, 3, 2, 1
+        countdown = [1101, 5, 0, 100, 4, 100, 1001, 100, -1, 100, 1005, 100, 4, 99]
+        for engine in (IntcodeComputer, CompiledIntcodeComputer):
+            with self.subTest(engine.__name__):
+                computer = engine(countdown, output_limit=2)
+                self.assertEqual([2, 1], computer.run())
+                self.assertEqual(5, computer.outputs_produced)
+
+                computer = engine(countdown, output_limit=2, overflow=IntcodeComputer.DROP_NEWEST)
+                self.assertEqual([5, 4], computer.run())
+
+                computer = engine(countdown, output_limit=2, overflow=IntcodeComputer.RAISE)
+                with self.assertRaises(BufferError):
+                    computer.run()
+
+    def test_batch_matches_scalar(self):
+        programs = [
+            (self.DAY_5_MEMORY_1, [[value] for value in range(-3, 4)]),
+            (self.DAY_5_MEMORY_2, [[value] for value in range(-3, 4)]),
+            (self.DAY_7_MEMORY_3, [[phase, signal] for phase in range(5) for signal in (-7, 0, 12345)]),
+            # Relative mode writes, and a lane that waits for input
+            ([109, 1, 203, 2, 204, 2, 99], [[5], [-5], []]),
+            # Products beyond int64 and addresses beyond memory_size fall back to the scalar interpreter
+            ([3, 9, 1002, 9, 3037000500, 9, 4, 9, 99, 0], [[1], [3037000500]]),
+            ([3, 0, 4, 0, 1101, 1, 1, 100000, 99], [[7]]),
+        ]
+        for memory, inputs in programs:
+            with self.subTest(memory=memory):
+                expected = []
+                for lane_inputs in inputs:
+                    computer = IntcodeComputer(memory)
+                    computer.run(*lane_inputs)
+                    expected.append(list(computer.output_values))
+                self.assertEqual(expected, BatchIntcodeComputer(memory).run(inputs))
+
+        # Jumps to its input. At 5 a jump that is taken to the output, at 23 one whose parameters are past
+        # the end of memory, which only sends its own lane to the scalar interpreter
+        memory = [3, 20, 105, 1, 20, 1106, 0, 9, 99, 104, 7, 99] + [0] * 11 + [1106]
+        batch = BatchIntcodeComputer(memory, memory_size=len(memory))
+        self.assertEqual([[], [7]], batch.run([[23], [5]]))
+        self.assertEqual([True, False], batch.fallback.tolist())
+
+    def test_benchmark_workloads(self):
+        for engine in (IntcodeComputer, CompiledIntcodeComputer):
+            with self.subTest(engine=engine.__name__):
+                self.assertIsNone(engine(countdown_loop(1000)).run())
+                self.assertEqual(1000, engine(relative_loop(1000)).run())
+                self.assertEqual(1, engine(large_address_loop(10)).run())
+
+        baseline = {'results': {'a/interpreter': {'wall_time': 1.0}, 'b/interpreter': {'wall_time': 1.0}}}
+        current = {'results': {'a/interpreter': {'wall_time': 1.05}, 'b/interpreter': {'wall_time': 1.2}}}
+        regressions = compare(current, baseline, 0.1)
+        self.assertEqual(1, len(regressions))
+        self.assertTrue(regressions[0].startswith('b/interpreter'))
+
+    def test_profiler(self):
+        profiler = Profiler(clock=count(0, 5).__next__)
+        computer = IntcodeComputer(countdown_loop(3), profiler=profiler)
+        self.assertIsNone(computer.run())
+        self.assertEqual(7, profiler.steps)
+        self.assertEqual({1: 3, 5: 3, 99: 1}, profiler.opcode_counts)
+        self.assertEqual({1: 15, 5: 15, 99: 5}, profiler.opcode_times)
+        self.assertEqual({(1, (0, 1, 0)): 3, (5, (0, 1)): 3, (99, ()): 1}, profiler.mode_counts)
+        self.assertEqual({0: 3, 4: 3, 7: 1}, profiler.address_counts)
+        self.assertEqual([(0, 3, 30), (7, 1, 5)], profiler.hottest_blocks())
+        self.assertEqual(9, profiler.max_address)
+        self.assertIn('jnz 01', profiler.report())
+
+        collapsed = io.StringIO()
+        profiler.write_collapsed(collapsed, weight='count')
+        self.assertEqual('intcode;block 0;0 add 3\nintcode;block 0;4 jnz 3\nintcode;block 7;7 halt 1\n',
+                         collapsed.getvalue())
+
+    def test_program_analysis(self):
+        analysis = ProgramAnalysis(countdown_loop(3))
+        self.assertEqual([0, 4, 7], sorted(analysis.instructions))
+        self.assertEqual({0: (0, 7), 7: ()}, {start: block.successors for start, block in analysis.blocks.items()})
+        self.assertEqual({9}, analysis.writes)
+        self.assertEqual([(0, 0)], analysis.loops())
+        self.assertTrue(analysis.code_is_constant)
+        self.assertIn('jnz [9], #0', analysis.listing())
+
+        # Writes into its own code, and through a relative base that changes in a loop
+        self.assertFalse(ProgramAnalysis([1101, 1, 2, 0, 99]).code_is_constant)
+        analysis = ProgramAnalysis(relative_loop(3))
+        self.assertEqual([4], analysis.unknown_writes)
+        self.assertFalse(analysis.code_is_constant)
+        # A constant relative base resolves relative writes
+        analysis = ProgramAnalysis([109, 1000, 21101, 1, 2, 3, 204, 3, 99])
+        self.assertEqual({1003}, analysis.writes)
+        self.assertTrue(analysis.code_is_constant)
+
+        # Calls and returns through the stack: the pushed return address is a code pointer
+        analysis = ProgramAnalysis([109, 100, 21101, 0, 9, 0, 1105, 1, 11, 4, 0, 104, 7, 2106, 0, 0])
+        self.assertEqual([13], analysis.indirect_jumps)
+        self.assertEqual({9}, analysis.code_pointers)
+        self.assertIn(9, analysis.blocks)
+
+    def test_compiled_engine_external_write_into_constant_code(self):
+        # Reads an input, outputs the counter and decrements it, until the counter is 0
+        computer = CompiledIntcodeComputer([3, 14, 4, 13, 1001, 13, -1, 13, 1005, 13, 0, 99, 0, 14, 0])
+        self.assertEqual(14, computer.run(1))
+        # Now the decrement overwrites the address the jump tests, which becomes 12, a cell holding 0
+        computer.write(7, 9)
+        self.assertEqual([14, 13], computer.run(1))
+        self.assertTrue(computer.finished)
+
+    def test_compiled_engine_restores_state_of_other_program(self):
+        # Outputs its input forever, its code is never written to
+        reader = [3, 20, 4, 20, 1105, 1, 0] + [0] * 20
+        # Overwrites the parameter of its output instruction
+        writer = [1101, 0, 2, 5, 104, 1, 99]
+        for state in (CompiledIntcodeComputer(writer).snapshot(), IntcodeComputer(writer).snapshot()):
+            computer = CompiledIntcodeComputer(reader)
+            computer.restore(state)
+            self.assertEqual(2, computer.run())
+
+        # A state of the same program keeps the blocks without checks
+        computer = CompiledIntcodeComputer(reader)
+        computer.run(5)
+        state = computer.snapshot()
+        computer.restore(state)
+        self.assertFalse(computer._checked)
+        self.assertEqual([5, 6], computer.run(6))
+
+    def test_fusion(self):
+        boost = load_program('./day9input')
+        programs = [
+            (boost, [1]),
+            (boost, [2]),
+            (self.DAY_5_MEMORY_1, [5]),
+            (self.DAY_7_MEMORY_3, [1, 0]),
+            (countdown_loop(10), []),
+            (relative_loop(10), []),
+            # The call stores its return address over its own jump target
+            ([109, 2, 21101, 11, 0, 6, 1105, 1, 13, 99, 99, 104, 7, 99, 104, 8, 99], []),
+            ([21102, 6, 0, 1, 1105, 1, 3, 99, 99], []),
+        ]
+        for memory, inputs in programs:
+            with self.subTest(memory=memory[:8], inputs=inputs):
+                computer = IntcodeComputer(memory)
+                fused = IntcodeComputer(memory, fuse=True)
+                self.assertEqual(computer.run(*inputs), fused.run(*inputs))
+                self.assertEqual(list(computer.memory), list(fused.memory))
+                self.assertEqual(computer.relative_base, fused.relative_base)
+                self.assertEqual(computer.instructions, fused.instructions)
+
+        fused = IntcodeComputer(boost, fuse=True)
+        fused.run(2)
+        self.assertEqual({'compare_branch', 'call', 'jump', 'return'}, set(fused.fusion_stats))
+        self.assertEqual(17, fused.fused_instructions)
+
+    def test_fusion_self_modifying_code(self):
+        # Outputs and decrements a counter with a fused increment, until the jump tests a cell holding 0
+        computer = IntcodeComputer([3, 14, 4, 13, 1001, 13, -1, 13, 1005, 13, 0, 99, 0, 14, 0], fuse=True)
+        self.assertEqual(14, computer.run(1))
+        self.assertEqual({'increment': 1}, computer.fusion_stats)
+        computer.write(7, 9)
+        self.assertEqual([14, 13], computer.run(1))
+        self.assertTrue(computer.finished)
+
+    def test_load_text(self):
+        text = '3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9\n'
+        for chunk_size in (1, 2, 5, 1 << 16):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.DAY_5_MEMORY_1, load_text(io.StringIO(text), chunk_size))
+
+    def test_image(self):
+        boost = load_program('./day9input')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'boost.img')
+            save_image(path, boost)
+            image = load_program(path)
+            self.assertIsInstance(image, memoryview)
+            self.assertEqual(boost, list(image))
+
+            computer = IntcodeComputer(image)
+            self.assertIsInstance(computer.memory.dense, memoryview)
+            self.assertEqual(2955820355, computer.run(1))
+            self.assertEqual(boost, list(image))
+
+            # Words beyond an int64 are escaped
+            program = [104, 1125899906842624, 104, 2 ** 70, 104, -2 ** 63, 104, -2 ** 80, 99]
+            save_image(path, program)
+            self.assertEqual(program, load_image(path))
+            self.assertEqual(program[1:-1:2], IntcodeComputer(load_image(path)).run())
+            del image, computer
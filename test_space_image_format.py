@@ -0,0 +1,117 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from day8 import height, width
+from space_image_format import CHUNK_LAYERS, MappedSpaceImage, SpaceImage, SpaceImageBatch, parse_digits
+
+
+class TestSpaceImage(TestCase):
+    def test_checksum(self):
+        image = SpaceImage.from_string('123456789012', 3, 2)
+        self.assertEqual([[[1, 2, 3], [4, 5, 6]], [[7, 8, 9], [0, 1, 2]]], image.layers.tolist())
+        self.assertEqual([[0, 1, 1, 1, 1, 1, 1, 0, 0, 0], [1, 1, 1, 0, 0, 0, 0, 1, 1, 1]], image.histograms().tolist())
+        self.assertEqual(1, image.checksum())
+
+    def test_decode(self):
+        image = SpaceImage.from_string('0222112222120000\n', 2, 2)
+        self.assertEqual([[0, 1], [1, 0]], image.decode().tolist())
+        self.assertEqual('  1\n1  ', image.render())
+        self.assertEqual([[2]], SpaceImage.from_string('222', 1, 1).decode().tolist())
+
+    def test_day8(self):
+        with open('./day8input') as f:
+            data = f.read().strip()
+        image = SpaceImage.from_string(data, width, height)
+        layers = np.array(list(data)).astype(int).reshape((-1, height, width))
+        fewest_zeros = min(layers, key=lambda layer: (layer == 0).sum())
+        self.assertEqual((fewest_zeros == 1).sum() * (fewest_zeros == 2).sum(), image.checksum())
+
+        expected = np.full((height, width), 2)
+        for layer in layers:
+            for i, row in enumerate(layer):
+                for j, value in enumerate(row):
+                    if value < 2 and expected[i][j] == 2:
+                        expected[i][j] = value
+        self.assertEqual(expected.tolist(), image.decode().tolist())
+
+    def test_errors(self):
+        with self.assertRaisesRegex(ValueError, "Not a digit at position 2: '-'"):
+            parse_digits('12-3')
+        with self.assertRaisesRegex(ValueError, 'do not make layers of 3x2'):
+            SpaceImage.from_string('1234567', 3, 2)
+
+
+class TestMappedSpaceImage(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, data: str) -> str:
+        path = os.path.join(self.directory.name, 'image')
+        with open(path, 'w') as f:
+            f.write(data)
+        return path
+
+    def test_day8(self):
+        with open('./day8input') as f:
+            image = SpaceImage.from_string(f.read(), width, height)
+        for chunk_layers in (1, 7, 1000):
+            with self.subTest(chunk_layers=chunk_layers):
+                mapped = MappedSpaceImage('./day8input', width, height, chunk_layers)
+                self.assertEqual(len(image.layers), mapped.layer_count)
+                self.assertEqual(image.histograms().tolist(), [list(h) for h in mapped.iter_histograms()])
+                self.assertEqual(image.checksum(), mapped.checksum())
+                self.assertEqual(image.decode().tolist(), mapped.decode().tolist())
+
+    def test_stops_when_opaque(self):
+        # Layer 1 fills in the last transparent pixel, layer 2 is never needed
+        path = self.write('0122' + '2210' + '0000' + '\n')
+        mapped = MappedSpaceImage(path, 2, 2, chunk_layers=1)
+        self.assertEqual([[0, 1], [1, 0]], mapped.decode().tolist())
+        self.assertEqual(2, mapped.layers_decoded)
+        self.assertEqual(3, mapped.layer_count)
+        # With the default chunks only the first one is read
+        mapped = MappedSpaceImage(self.write('0110' * (CHUNK_LAYERS * 3)), 2, 2)
+        self.assertEqual([[0, 1], [1, 0]], mapped.decode().tolist())
+        self.assertEqual(CHUNK_LAYERS, mapped.layers_decoded)
+
+    def test_errors(self):
+        mapped = MappedSpaceImage(self.write('0122221x'), 2, 2, chunk_layers=1)
+        with self.assertRaisesRegex(ValueError, "Not a digit at position 7: 'x'"):
+            mapped.decode()
+        with self.assertRaisesRegex(ValueError, 'do not make layers of 2x2'):
+            MappedSpaceImage(self.write('012'), 2, 2)
+        with self.assertRaisesRegex(ValueError, 'at least one layer'):
+            MappedSpaceImage(self.write('0122'), 2, 2, chunk_layers=0)
+        with self.assertRaisesRegex(ValueError, 'no layers'):
+            MappedSpaceImage(self.write(''), 2, 2).checksum()
+
+
+class TestSpaceImageBatch(TestCase):
+    def test_same_as_single_images(self):
+        rng = np.random.default_rng(22)
+        images = []
+        for w, h, layers in [(25, 6, 100), (3, 2, 4), (25, 6, 100), (1, 1, 1), (3, 2, 7), (3, 2, 4)] * 3:
+            digits = rng.choice(3, size=w * h * layers, p=[0.2, 0.2, 0.6]).astype(np.uint8)
+            images.append((''.join(map(str, digits.tolist())), w, h))
+        with open('./day8input') as f:
+            images.append((f.read(), width, height))
+        images.append((np.array([2, 1, 0, 0, 1, 2, 2, 2]), 2, 2))
+
+        expected = [(SpaceImage.from_string(data, w, h) if isinstance(data, str) else SpaceImage(data, w, h))
+                    for data, w, h in images]
+        for workers, chunk_size in [(1, None), (2, None), (2, 1)]:
+            with self.subTest(workers=workers, chunk_size=chunk_size):
+                results = SpaceImageBatch(images, workers=workers, chunk_size=chunk_size).run()
+                self.assertEqual([image.checksum() for image in expected], [result.checksum for result in results])
+                self.assertEqual([image.decode().tolist() for image in expected],
+                                 [result.image.tolist() for result in results])
+
+    def test_errors(self):
+        with self.assertRaisesRegex(ValueError, 'Image 1: 3 digits do not make layers of 2x2'):
+            SpaceImageBatch([('0000', 2, 2), ('000', 2, 2)], workers=1).run()